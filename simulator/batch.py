@@ -0,0 +1,514 @@
+"""
+Headless batch runner for simulations.
+
+Runs grid of algorithms, process counts and models on graphs from project
+or from graph files without GUI (gtk, gobject and matplotlib are never
+imported). Independent runs can be executed in pool of worker processes.
+Results are written to CSV file. Each run can be profiled, profile
+reports are written next to results.
+
+Example:
+    python -m simulator.batch -p project.xml -r "Algorithm 1" -pr 1 2 4 -c 10 -j 4 -o results.csv
+    python -m simulator.batch -g graph.xml -r "Algorithm 1" -pr 4 --profile cprofile -o results.csv
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+from simulator.gui.graphmanager import GraphManager
+from simulator.gui.projectloader import ProjectLoader
+from simulator.gui.exportmodule import CSVExportDataModule
+from simulator.sim import simulation
+from simulator.sim import environment
+from simulator.sim import profiler
+from simulator.sim.processes.process import MessageBatching, MessagePool
+from simulator.sim.processes import monitor
+from simulator.sim import processfactory as pf
+
+
+def get_memory_peak(sim):
+    """
+    Returns maximum of used memory by all processes in finished simulation.
+
+    :param: sim: finished simulation
+    :type: Simulation
+    :return: memory peak
+    :rtype: int
+    """
+    memory_peak = 0
+    mem_monitor = sim.ctx.monitor_manager.get_monitor("GlobalMemoryMonitor")
+    if mem_monitor:
+        mem_usage_entry = "memory_usage"
+        data = mem_monitor.collect([mem_usage_entry])
+        for _, size in data[mem_usage_entry]:
+            if size > memory_peak:
+                memory_peak = size
+    return memory_peak
+
+
+_worker_runner = None
+
+
+def _init_worker(runner):
+    global _worker_runner
+    _worker_runner = runner
+    # forked workers share random state of parent
+    random.seed()
+
+
+def _run_worker_task(args):
+    index, task = args
+    return index, _worker_runner.run_task(task, index)
+
+
+class BatchTask():
+    """
+    Description of one simulation run. Models are stored by name
+    so task can be sent to other process.
+    """
+    def __init__(self, filename, process_type, process_count,
+                 network_model, process_model, arguments, run, seed = None,
+                 environment_name = None, monitor_profile = None,
+                 message_batching = None, recycle_messages = False):
+        self.filename = filename
+        self.process_type = process_type
+        self.process_count = process_count
+        self.network_model = network_model
+        self.process_model = process_model
+        self.arguments = arguments
+        self.run = run
+        self.seed = seed
+        self.environment_name = environment_name
+        self.monitor_profile = monitor_profile
+        self.message_batching = message_batching
+        self.recycle_messages = recycle_messages
+
+    def create_simulation(self, graph, trace_filename = None):
+        factory = pf.process_factory
+        return simulation.Simulation(self.process_type,
+                                     self.process_count,
+                                     graph,
+                                     factory.get_network_model(self.network_model),
+                                     factory.get_process_model(self.process_model),
+                                     self.arguments,
+                                     self.environment_name,
+                                     self.monitor_profile,
+                                     trace_filename,
+                                     self.message_batching,
+                                     MessagePool() if self.recycle_messages else None)
+
+
+class BatchResult():
+    """
+    Compact summary of finished simulation run.
+    """
+    COMPLETED = "Completed"
+    ERROR = "Error"
+
+    HEADER = ["Filename", "Algorithm", "Process count", "Network model",
+              "Process model", "Arguments", "Run", "Status", "Time",
+              "Memory peak", "Error"]
+
+    def __init__(self, task):
+        self.task = task
+        self.status = self.COMPLETED
+        self.time = 0
+        self.memory_peak = 0
+        self.error = ""
+
+    def on_error(self, error):
+        self.status = self.ERROR
+        self.error = str(error)
+
+    def is_completed(self):
+        return self.status == self.COMPLETED
+
+    def get_row(self):
+        t = self.task
+        return [t.filename,
+                t.process_type,
+                t.process_count,
+                t.network_model,
+                t.process_model,
+                json.dumps(t.arguments, sort_keys = True),
+                t.run,
+                self.status,
+                self.time,
+                self.memory_peak,
+                self.error]
+
+
+class BatchRunner():
+    """
+    Runs all combinations of given settings on given graph files.
+
+    :param: graph_manager: graph manager containing graph files
+    :type: GraphManager
+    :param: files: graph files used for simulations
+    :type: list of str
+    :param: process_types: names of algorithms
+    :type: list of str
+    :param: process_counts: process counts
+    :type: list of int
+    :param: network_models: names of network models
+    :type: list of str
+    :param: process_models: names of process models
+    :type: list of str
+    :param: sim_count: count of repeated runs of each configuration
+    :type: int
+    :param: arguments: algorithm arguments overriding default values
+    :type: dict
+    :param: export_dir: directory for CSV export of monitors of each run
+    :type: str | None
+    :param: seed: base seed of random generator, run with index 'i' uses\
+    'seed + i' (runs are not reproducible if None)
+    :type: int | None
+    :param: environment_name: name of simulation environment
+    :type: str | None
+    :param: monitor_profile: name of monitor profile or list of monitors
+    :type: str | list of str | None
+    :param: trace_dir: directory for trace files of monitors of each run\
+    (monitors keep measured values in memory if None)
+    :type: str | None
+    :param: profile: mode of profiler of each run (see SimulationProfiler),\
+    runs are not profiled if None
+    :type: str | None
+    :param: profile_dir: directory for profile reports of each run
+    :type: str | None
+    :param: message_batching: batching of asynchronous messages\
+    (messages are not batched if None)
+    :type: MessageBatching | None
+    :param: recycle_messages: recycle delivered asynchronous messages\
+    (see MessagePool)
+    :type: bool
+    """
+    def __init__(self, graph_manager, files, process_types, process_counts,
+                 network_models, process_models, sim_count = 1,
+                 arguments = None, export_dir = None, seed = None,
+                 environment_name = None, monitor_profile = None,
+                 trace_dir = None, profile = None, profile_dir = None,
+                 message_batching = None, recycle_messages = False):
+        self.graph_manager = graph_manager
+        self.files = files
+        self.process_types = process_types
+        self.process_counts = process_counts
+        self.network_models = network_models
+        self.process_models = process_models
+        self.sim_count = sim_count
+        self.arguments = arguments or {}
+        self.export_dir = export_dir
+        self.seed = seed
+        self.environment_name = environment_name
+        self.monitor_profile = monitor_profile
+        self.trace_dir = trace_dir
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.message_batching = message_batching
+        self.recycle_messages = recycle_messages
+
+    def get_process_arguments(self, process_type):
+        params = pf.process_factory.get_process_parameters(process_type)
+        arguments = {}
+        for name, (val, t) in params.iteritems():
+            arguments[name] = t(self.arguments.get(name, val))
+        return arguments
+
+    def get_tasks(self):
+        tasks = []
+        grid = itertools.product(self.files,
+                                 self.process_types,
+                                 self.process_counts,
+                                 self.network_models,
+                                 self.process_models)
+        for filename, process_type, process_count, nm, pm in grid:
+            arguments = self.get_process_arguments(process_type)
+            for run in xrange(self.sim_count):
+                seed = None
+                if self.seed is not None:
+                    seed = self.seed + len(tasks)
+                tasks.append(BatchTask(filename, process_type, process_count,
+                                       nm, pm, arguments, run, seed,
+                                       self.environment_name,
+                                       self.monitor_profile,
+                                       self.message_batching,
+                                       self.recycle_messages))
+        return tasks
+
+    def run(self, callback = None, jobs = 1):
+        """
+        Runs all simulations. If 'jobs' is greater than 1, simulations
+        are executed in pool of 'jobs' worker processes. Graphs are passed
+        to each worker only once when worker is created and only
+        results summaries are sent back.
+
+        :param: callback: function called with each finished BatchResult
+        :type: Function | None
+        :param: jobs: count of worker processes
+        :type: int
+        :return: results of simulations in order of tasks
+        :rtype: list of BatchResult
+        """
+        tasks = self.get_tasks()
+        if jobs > 1 and len(tasks) > 1:
+            return self._run_parallel(tasks, callback, jobs)
+
+        results = []
+        for i, task in enumerate(tasks):
+            result = self.run_task(task, i)
+            results.append(result)
+            if callback:
+                callback(result)
+        return results
+
+    def _run_parallel(self, tasks, callback, jobs):
+        results = [None] * len(tasks)
+        pool = multiprocessing.Pool(min(jobs, len(tasks)),
+                                    _init_worker,
+                                    (self,))
+        try:
+            for i, result in pool.imap_unordered(_run_worker_task,
+                                                 enumerate(tasks)):
+                results[i] = result
+                if callback:
+                    callback(result)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        return results
+
+    def run_task(self, task, index = 0):
+        if not self.graph_manager.contain_filename(task.filename):
+            self.graph_manager.add_graph_file(task.filename)
+        if task.seed is not None:
+            random.seed(task.seed)
+        graph = self.graph_manager.get_graph(task.filename)
+        name = "{0}_{1}".format(
+            os.path.splitext(os.path.basename(task.filename))[0], index)
+        trace_filename = None
+        if self.trace_dir:
+            trace_filename = os.path.join(self.trace_dir, name + ".trace")
+        sim = task.create_simulation(graph, trace_filename)
+        if self.profile:
+            sim.set_profiler(profiler.SimulationProfiler(self.profile))
+        result = BatchResult(task)
+        sim.connect("stop", result.on_error)
+        sim.connect("interrupt", result.on_error)
+        sim.start()
+        if self.profile:
+            filename = os.path.join(self.profile_dir or "", name + ".profile.txt")
+            sim.get_profiler().write_report(filename)
+        if result.is_completed():
+            result.time = sim.ctx.env.now
+            result.memory_peak = get_memory_peak(sim)
+            if self.export_dir:
+                filename = os.path.join(self.export_dir, name + ".csv")
+                try:
+                    CSVExportDataModule(filename, sim).print_to_file()
+                except Exception as ex:
+                    result.on_error("Export failed: {0}".format(ex))
+        sim.ctx.monitor_manager.close_trace()
+        return result
+
+
+def write_results(results, output):
+    lines = [";".join(BatchResult.HEADER) + ";\n"]
+    for r in results:
+        lines.append(";".join([str(v) for v in r.get_row()]) + ";\n")
+    output.write("".join(lines))
+    output.flush()
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(prog = "python -m simulator.batch",
+                                     description = "Run simulations without GUI")
+    parser.add_argument("-p", "--project", type = str, help = "Project file location")
+    parser.add_argument("-g", "--graphs", type = str, nargs = "+", default = [],
+                        help = "Graph files used for simulation")
+    parser.add_argument("-s", "--select", type = int, nargs = "+",
+                        help = "Graph positions in project (starting from 1)")
+    parser.add_argument("-r", "--run", type = str, nargs = "+",
+                        help = "Algorithms used for simulation")
+    parser.add_argument("-nm", "--network_model", type = str, nargs = "+",
+                        help = "Network models used for simulation")
+    parser.add_argument("-pm", "--process_model", type = str, nargs = "+",
+                        help = "Process models used for simulation")
+    parser.add_argument("-pr", "--processes", type = int, nargs = "+", default = [1],
+                        help = "Process counts used for algorithm")
+    parser.add_argument("-c", "--count", type = int, default = 1,
+                        help = "Simulation count of each configuration")
+    parser.add_argument("-args", "--arguments", type = json.loads,
+                        help = "Arguments used for algorithms in JSON format")
+    parser.add_argument("-o", "--output", type = str,
+                        help = "Output CSV file (standard output if not specified)")
+    parser.add_argument("-e", "--export_dir", type = str,
+                        help = "Directory for CSV export of monitors of each simulation")
+    parser.add_argument("-t", "--trace_dir", type = str,
+                        help = "Directory for trace files of monitors of each simulation \
+(measured values are stored on disk during simulation)")
+    parser.add_argument("-j", "--jobs", type = int, default = 1,
+                        help = "Count of worker processes (0 means count of CPUs)")
+    parser.add_argument("--seed", type = int,
+                        help = "Base seed for reproducible runs")
+    parser.add_argument("-env", "--environment", type = str,
+                        choices = environment.get_environments(),
+                        help = "Simulation environment (default '{0}')".format(
+                            environment.DEFAULT_ENVIRONMENT))
+    parser.add_argument("-m", "--monitors", type = str,
+                        help = "Monitor profile (none, summary, full) or comma separated \
+names of monitors (default '{0}', memory peak requires 'summary')".format(
+                            monitor.DEFAULT_PROFILE))
+    parser.add_argument("--profile", type = str, choices = profiler.MODES,
+                        help = "Profile each simulation (events: counts of events and \
+times of phases, cprofile and sampling: functions too)")
+    parser.add_argument("--profile_dir", type = str,
+                        help = "Directory for profile reports (directory of output \
+file by default)")
+    parser.add_argument("--batch_window", type = float,
+                        help = "Batch asynchronous messages to same target sent \
+within this time (0 for messages sent at same time)")
+    parser.add_argument("--batch_size", type = int,
+                        help = "Maximum count of messages in batch (enables batching \
+with window 0 if --batch_window is not specified)")
+    parser.add_argument("--recycle_messages", action = "store_true",
+                        help = "Reuse delivered asynchronous messages (lower allocation \
+and GC overhead in communication heavy runs)")
+    parser.add_argument("--no_cache", action = "store_true",
+                        help = "Do not use binary cache of graphs given by --graphs")
+    parser.add_argument("-q", "--quiet", action = "store_true",
+                        help = "Do not print progress")
+    return parser
+
+
+def main(argv):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    factory = pf.process_factory
+
+    if args.jobs < 0:
+        parser.error("Jobs count can't be smaller than 0")
+    jobs = args.jobs or multiprocessing.cpu_count()
+
+    def on_graph_file(filename, done, count, error):
+        if error:
+            sys.stderr.write("Graph file skipped: {0}\n".format(error))
+        elif not args.quiet:
+            sys.stderr.write("Graph '{0}' loaded ({1}/{2})\n".format(
+                os.path.basename(filename), done, count))
+
+    if args.project:
+        try:
+            project = ProjectLoader.load_project(args.project,
+                                                 on_graph_file,
+                                                 jobs)
+        except Exception as ex:
+            parser.error("Project is corrupted ({0})".format(ex.message))
+        graph_manager = project.graph_manager
+        files = project.get_files()
+        if args.select:
+            for s in args.select:
+                if s < 1 or s > len(files):
+                    parser.error("Selection must be between 1 to {0}".format(len(files)))
+            files = [files[s - 1] for s in args.select]
+    else:
+        graph_manager = GraphManager(not args.no_cache)
+        files = []
+
+    for filename in args.graphs:
+        if not graph_manager.contain_filename(filename):
+            try:
+                graph_manager.add_graph_file(filename)
+            except Exception as ex:
+                parser.error(ex.message)
+        files.append(filename)
+
+    if len(files) == 0:
+        parser.error("No graph files for simulation")
+
+    process_types = args.run or factory.get_processes_names()[:1]
+    network_models = args.network_model or factory.get_network_models()[:1]
+    process_models = args.process_model or factory.get_process_models()[:1]
+
+    for name in process_types:
+        if name not in factory.get_processes_names():
+            parser.error("Unknown algorithm '{0}'".format(name))
+    for name in network_models:
+        if factory.get_network_model(name) is None:
+            parser.error("Unknown network model name '{0}'".format(name))
+    for name in process_models:
+        if factory.get_process_model(name) is None:
+            parser.error("Unknown process model name '{0}'".format(name))
+    for count in args.processes:
+        if count < 1:
+            parser.error("Process count must be greater than 0")
+    if args.count < 1:
+        parser.error("Simulation count must be greater than 0")
+    monitor_profile = args.monitors
+    if monitor_profile and monitor_profile not in monitor.profiles:
+        monitor_profile = [m.strip() for m in monitor_profile.split(",")]
+    try:
+        monitor.get_monitor_profile(monitor_profile)
+    except Exception as ex:
+        parser.error(ex.message)
+    if args.export_dir and not os.path.isdir(args.export_dir):
+        parser.error("Export directory '{0}' not exists".format(args.export_dir))
+    if args.trace_dir and not os.path.isdir(args.trace_dir):
+        parser.error("Trace directory '{0}' not exists".format(args.trace_dir))
+    profile_dir = args.profile_dir
+    if args.profile and not profile_dir:
+        profile_dir = os.path.dirname(os.path.abspath(args.output)) if args.output else "."
+    if args.profile:
+        try:
+            profiler.SimulationProfiler(args.profile)
+        except Exception as ex:
+            parser.error(ex.message)
+        if not os.path.isdir(profile_dir):
+            parser.error("Profile directory '{0}' not exists".format(profile_dir))
+
+    message_batching = None
+    if args.batch_window is not None or args.batch_size is not None:
+        try:
+            message_batching = MessageBatching(args.batch_window or 0,
+                                               args.batch_size)
+        except Exception as ex:
+            parser.error(ex.message)
+
+    runner = BatchRunner(graph_manager, files, process_types, args.processes,
+                         network_models, process_models, args.count,
+                         args.arguments, args.export_dir, args.seed,
+                         args.environment, monitor_profile, args.trace_dir,
+                         args.profile, profile_dir, message_batching,
+                         args.recycle_messages)
+
+    def on_result(result):
+        if not args.quiet:
+            t = result.task
+            msg = "{0} - {1}({2}) run {3}: {4} time={5} memory_peak={6}\n"
+            sys.stderr.write(msg.format(os.path.basename(t.filename),
+                                        t.process_type,
+                                        t.process_count,
+                                        t.run,
+                                        result.status,
+                                        result.time,
+                                        result.memory_peak))
+
+    results = runner.run(on_result, jobs)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            write_results(results, f)
+    else:
+        write_results(results, sys.stdout)
+
+    if all(r.is_completed() for r in results):
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,420 @@
+"""
+Benchmark suite of simulations.
+
+Suite consists of reference graphs (generated once with fixed seed
+to graph directory) and scenarios (algorithms, process counts, network
+and process models) run on them. Each scenario is run in new worker
+process, so peak RSS is measured for each scenario separately. Results
+(wall time, events/s, peak RSS, monitor memory) are appended to JSON
+history file and two runs from history can be compared.
+
+Example:
+    python -m simulator.benchmark --suite quick -o benchmarks.json
+    python -m simulator.benchmark -o benchmarks.json --compare
+"""
+import argparse
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from simulator.batch import BatchTask, get_memory_peak
+from simulator.gui import paths
+from simulator.gui.graphgenerator import GraphGenerator
+from simulator.gui.graphmanager import GraphManager
+from simulator.sim import processfactory as pf
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+GRAPH_SEED = 1
+SIMULATION_SEED = 1
+DEFAULT_GRAPHS_DIR = os.path.join(paths.ROOT, ".benchmarks")
+DEFAULT_HISTORY = "benchmarks.json"
+DEFAULT_MODELS = [("DefaultNetworkModel", "DefaultProcessModel")]
+
+
+class BenchmarkGraph():
+    """
+    Reference graph of suite. Graph is generated by pure Python path
+    of GraphGenerator, so it is same with or without NumPy.
+    """
+    def __init__(self, name, topology, nodes_count, edges_count, properties = None):
+        self.name = name
+        self.topology = topology
+        self.nodes_count = nodes_count
+        self.edges_count = edges_count
+        self.properties = dict(properties or {}, topology = topology)
+
+    def get_filename(self, directory):
+        return os.path.join(directory, "{0}-{1}.xml".format(self.name, GRAPH_SEED))
+
+    def create(self, directory):
+        filename = self.get_filename(directory)
+        if not os.path.exists(filename):
+            generator = GraphGenerator(filename, self.nodes_count, self.edges_count,
+                                       self.properties, GRAPH_SEED, False)
+            generator.create_graph(True)
+        return filename
+
+
+GRAPHS = collections.OrderedDict((g.name, g) for g in [
+    BenchmarkGraph("small-random", "random", 300, 1200),
+    BenchmarkGraph("medium-random", "random", 3000, 12000),
+    BenchmarkGraph("medium-layered", "layered", 3000, 12000),
+    BenchmarkGraph("medium-tree", "tree", 3000, 9000, {"branching": 3}),
+    BenchmarkGraph("medium-powerlaw", "powerlaw", 3000, 12000, {"alpha": 2.5}),
+    BenchmarkGraph("medium-lattice", "lattice", 4096, 0),
+    BenchmarkGraph("large-random", "random", 100000, 1000000),
+    BenchmarkGraph("large-powerlaw", "powerlaw", 100000, 1000000, {"alpha": 2.5}),
+])
+
+
+class ScenarioGroup():
+    """
+    All algorithms run on 'graphs' with 'process_counts' and 'models'.
+
+    :param: models: pairs of (network model, process model), all combinations\
+    of registered models if None
+    :type: list of tuple | None
+    """
+    def __init__(self, graphs, process_counts, models = None):
+        self.graphs = graphs
+        self.process_counts = process_counts
+        self.models = models
+
+    def get_models(self):
+        if self.models is not None:
+            return self.models
+        factory = pf.process_factory
+        return list(itertools.product(factory.get_network_models(),
+                                      factory.get_process_models()))
+
+
+QUICK = [ScenarioGroup(["small-random"], [1, 2, 4]),
+         ScenarioGroup(["medium-random", "medium-layered", "medium-tree",
+                        "medium-powerlaw", "medium-lattice"], [1, 4], DEFAULT_MODELS)]
+
+SUITES = collections.OrderedDict([
+    ("quick", QUICK),
+    ("full", QUICK + [ScenarioGroup(["large-random", "large-powerlaw"], [1, 8],
+                                    DEFAULT_MODELS)]),
+])
+
+
+class Scenario():
+    def __init__(self, graph, process_type, process_count, network_model,
+                 process_model):
+        self.graph = graph
+        self.process_type = process_type
+        self.process_count = process_count
+        self.network_model = network_model
+        self.process_model = process_model
+
+    def get_key(self):
+        return "|".join([self.graph, self.process_type, str(self.process_count),
+                         self.network_model, self.process_model])
+
+    def create_task(self, filename):
+        params = pf.process_factory.get_process_parameters(self.process_type)
+        arguments = dict((name, t(val)) for name, (val, t) in params.iteritems())
+        return BatchTask(filename, self.process_type, self.process_count,
+                         self.network_model, self.process_model, arguments, 0,
+                         SIMULATION_SEED)
+
+
+def get_scenarios(suite, process_types = None):
+    """
+    Returns scenarios of suite.
+
+    :param: suite: name of suite
+    :type: str
+    :param: process_types: names of algorithms (all algorithms if None)
+    :type: list of str | None
+    :return: scenarios
+    :rtype: list of Scenario
+    """
+    process_types = process_types or pf.process_factory.get_processes_names()
+    scenarios = []
+    for group in SUITES[suite]:
+        grid = itertools.product(group.graphs, process_types,
+                                 group.process_counts, group.get_models())
+        for graph, process_type, process_count, (nm, pm) in grid:
+            scenarios.append(Scenario(graph, process_type, process_count, nm, pm))
+    return scenarios
+
+
+def get_rss_peak():
+    """
+    Returns peak resident set size of current process in MB
+    (None if it can't be measured).
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_scenario(scenario, filename, repeat = 1):
+    """
+    Run scenario 'repeat' times. Wall time is the best time of runs,
+    other values are measured in last run.
+
+    :return: measured values
+    :rtype: dict
+    """
+    graph_manager = GraphManager()
+    graph_manager.add_graph_file(filename)
+    graph = graph_manager.get_graph(filename)
+    task = scenario.create_task(filename)
+    result = {"status": "Completed", "error": ""}
+    wall_times = []
+
+    def on_error(error):
+        result["status"] = "Error"
+        result["error"] = str(error)
+
+    for _ in xrange(repeat):
+        random.seed(task.seed)
+        sim = task.create_simulation(graph)
+        sim.connect("stop", on_error)
+        sim.connect("interrupt", on_error)
+        start = time.time()
+        sim.start()
+        wall_times.append(time.time() - start)
+        if result["status"] != "Completed":
+            break
+
+    wall_time = min(wall_times)
+    events = sim.ctx.env.get_events_count()
+    result.update({"wall_time": wall_time,
+                   "events": events,
+                   "events_per_sec": events / wall_time if wall_time > 0 else 0,
+                   "sim_time": sim.ctx.env.now,
+                   "memory_peak": get_memory_peak(sim),
+                   "monitor_memory": sim.ctx.monitor_manager.get_memory_size(),
+                   "rss_peak": get_rss_peak()})
+    return result
+
+
+def _create_graph(args):
+    name, graphs_dir = args
+    return name, GRAPHS[name].create(graphs_dir)
+
+
+def _run_scenario_task(args):
+    index, scenario, filename, repeat = args
+    try:
+        return index, run_scenario(scenario, filename, repeat)
+    except Exception as ex:
+        return index, {"status": "Error", "error": str(ex)}
+
+
+def run_suite(scenarios, graphs_dir, repeat = 1, jobs = 1, callback = None):
+    """
+    Generate missing graphs and run scenarios, each in new worker process.
+    Graphs are generated in separate pool, so workers of scenarios are not
+    forked from process which generated graphs and their peak RSS is not
+    affected by generating.
+
+    :param: callback: function called with (scenario, result) after\
+    each scenario
+    :type: Function | None
+    :return: results by keys of scenarios
+    :rtype: OrderedDict
+    """
+    if not os.path.isdir(graphs_dir):
+        os.makedirs(graphs_dir)
+    graphs = []
+    for s in scenarios:
+        if s.graph not in graphs:
+            graphs.append(s.graph)
+    pool = multiprocessing.Pool(jobs, maxtasksperchild = 1)
+    try:
+        filenames = dict(pool.map(_create_graph,
+                                  [(name, graphs_dir) for name in graphs],
+                                  chunksize = 1))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    tasks = [(i, s, filenames[s.graph], repeat) for i, s in enumerate(scenarios)]
+    results = [None] * len(tasks)
+    pool = multiprocessing.Pool(jobs, maxtasksperchild = 1)
+    try:
+        for i, result in pool.imap_unordered(_run_scenario_task, tasks):
+            results[i] = result
+            if callback:
+                callback(scenarios[i], result)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return collections.OrderedDict((s.get_key(), r) for s, r in zip(scenarios, results))
+
+
+def get_commit():
+    try:
+        with open(os.devnull, "w") as devnull:
+            return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                           cwd = paths.ROOT,
+                                           stderr = devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(filename):
+    if not os.path.exists(filename):
+        return {"runs": []}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_history(history, filename):
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w") as f:
+        json.dump(history, f, indent = 1, sort_keys = True)
+    if os.path.exists(filename) and sys.platform == "win32":
+        os.remove(filename)
+    os.rename(tmp_filename, filename)
+
+
+def find_run(history, selector):
+    """
+    Returns run from history by index (negative index counts from end)
+    or by prefix of commit or label.
+    """
+    runs = history["runs"]
+    try:
+        return runs[int(selector)]
+    except ValueError:
+        pass
+    except IndexError:
+        return None
+    for run in reversed(runs):
+        if (run.get("commit") or "").startswith(selector) or run.get("label") == selector:
+            return run
+    return None
+
+
+def _change(old, new):
+    if old is None or new is None:
+        return "-"
+    if not old:
+        return "{0:.4g}".format(new)
+    return "{0:.4g} ({1:+.1f}%)".format(new, (new - old) * 100.0 / old)
+
+
+def compare_runs(base, other, output):
+    """
+    Write changes of measured values between two runs.
+    """
+    def name(run):
+        return run.get("label") or (run.get("commit") or "?")[:10]
+
+    output.write("{0} -> {1}\n".format(name(base), name(other)))
+    values = ["wall_time", "events_per_sec", "rss_peak", "monitor_memory"]
+    output.write("scenario;status;" + ";".join(values) + "\n")
+    for key, result in sorted(other["results"].iteritems()):
+        old = base["results"].get(key)
+        if old is None:
+            output.write("{0};new\n".format(key))
+            continue
+        status = result["status"]
+        if old["status"] != status:
+            status = "{0} -> {1}".format(old["status"], status)
+        row = [key, status]
+        for v in values:
+            row.append(_change(old.get(v), result.get(v)))
+        output.write(";".join(row) + "\n")
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(prog = "python -m simulator.benchmark",
+                                     description = "Run benchmark suite")
+    parser.add_argument("--suite", type = str, default = "quick",
+                        choices = SUITES.keys(), help = "Suite of scenarios")
+    parser.add_argument("-r", "--run", type = str, nargs = "+",
+                        help = "Names of algorithms (all algorithms by default)")
+    parser.add_argument("-o", "--output", type = str, default = DEFAULT_HISTORY,
+                        help = "JSON history file (default '{0}')".format(DEFAULT_HISTORY))
+    parser.add_argument("--graphs_dir", type = str, default = DEFAULT_GRAPHS_DIR,
+                        help = "Directory of generated graphs of suite")
+    parser.add_argument("-c", "--repeat", type = int, default = 3,
+                        help = "Count of runs of each scenario (best wall time is stored)")
+    parser.add_argument("-j", "--jobs", type = int, default = 1,
+                        help = "Count of worker processes (timings are less stable with more jobs)")
+    parser.add_argument("--label", type = str, help = "Label of run in history")
+    parser.add_argument("--compare", type = str, nargs = "*",
+                        help = "Compare two runs from history (indexes, commits or labels, \
+last two runs by default) instead of running suite")
+    parser.add_argument("-q", "--quiet", action = "store_true",
+                        help = "Do not print progress")
+    return parser
+
+
+def main(argv):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        history = load_history(args.output)
+        selectors = args.compare or ["-2", "-1"]
+        if len(selectors) != 2:
+            parser.error("Two runs must be given for comparison")
+        runs = [find_run(history, s) for s in selectors]
+        for s, run in zip(selectors, runs):
+            if run is None:
+                parser.error("Run '{0}' not exists in history".format(s))
+        compare_runs(runs[0], runs[1], sys.stdout)
+        return 0
+
+    for name in args.run or []:
+        if name not in pf.process_factory.get_processes_names():
+            parser.error("Unknown algorithm '{0}'".format(name))
+    if args.repeat < 1:
+        parser.error("Repeat count must be greater than 0")
+    if args.jobs < 1:
+        parser.error("Jobs count must be greater than 0")
+
+    scenarios = get_scenarios(args.suite, args.run)
+
+    def on_result(scenario, result):
+        if not args.quiet:
+            msg = "{0}: {1} wall_time={2} events/s={3} rss_peak={4}\n"
+            sys.stderr.write(msg.format(scenario.get_key(),
+                                        result["status"],
+                                        result.get("wall_time"),
+                                        result.get("events_per_sec"),
+                                        result.get("rss_peak")))
+
+    results = run_suite(scenarios, args.graphs_dir, args.repeat, args.jobs, on_result)
+    history = load_history(args.output)
+    history["runs"].append({"commit": get_commit(),
+                            "label": args.label,
+                            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                            "python": platform.python_version(),
+                            "platform": platform.platform(),
+                            "suite": args.suite,
+                            "repeat": args.repeat,
+                            "results": results})
+    save_history(history, args.output)
+
+    if all(r["status"] == "Completed" for r in results.values()):
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,64 @@
+"""
+Headless generator of random graphs.
+
+Graph is streamed to XML file node by node, so large graphs (millions
+of edges) can be generated without holding document in memory.
+
+Example:
+    python -m simulator.generate graph.xml -n 1000000 -e 10000000 --topology powerlaw --seed 1
+"""
+import argparse
+import sys
+from simulator.gui import graphgenerator
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(prog = "python -m simulator.generate",
+                                     description = "Generate random graph")
+    parser.add_argument("filename", type = str, help = "Graph file location (.xml)")
+    parser.add_argument("-n", "--nodes", type = int, required = True,
+                        help = "Count of nodes")
+    parser.add_argument("-e", "--edges", type = int, default = 0,
+                        help = "Count of edges (ignored by lattice)")
+    parser.add_argument("--topology", type = str, default = "random",
+                        choices = graphgenerator.TOPOLOGIES,
+                        help = "Topology of graph (default 'random')")
+    parser.add_argument("--layers", type = int,
+                        help = "Count of layers of layered graph")
+    parser.add_argument("--branching", type = int,
+                        help = "Count of children of node in tree")
+    parser.add_argument("--alpha", type = float,
+                        help = "Exponent of power-law distribution of out-degrees")
+    parser.add_argument("--dimensions", type = int,
+                        help = "Count of dimensions of lattice")
+    parser.add_argument("--seed", type = int, default = -1,
+                        help = "Seed of random generator (-1 for random seed)")
+    parser.add_argument("--cache", action = "store_true",
+                        help = "Write binary cache of graph too")
+    parser.add_argument("--no_numpy", action = "store_true",
+                        help = "Do not use vectorised generation (NumPy)")
+    return parser
+
+
+def main(argv):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    properties = {"topology": args.topology}
+    for name in ("layers", "branching", "alpha", "dimensions"):
+        value = getattr(args, name)
+        if value is not None:
+            properties[name] = value
+
+    try:
+        generator = graphgenerator.GraphGenerator(args.filename, args.nodes,
+                                                  args.edges, properties,
+                                                  args.seed,
+                                                  False if args.no_numpy else None)
+    except Exception as ex:
+        parser.error(ex.message)
+    generator.create_graph(args.cache)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
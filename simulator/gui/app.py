@@ -60,7 +60,8 @@ class App():
             try:
                 msg = "Opening project at location '{0}'".format(project_file)
                 self.window.console.writeln(msg)
-                project = ProjectLoader.load_project(project_file)
+                project = ProjectLoader.load_project(project_file,
+                                                     self._on_graph_file_loaded)
                 self._open_project(project)
                 msg = "Project '{0}' was opened".format(project.get_name())
                 self.window.console.writeln(msg)
@@ -69,6 +70,13 @@ class App():
             except exc.ProjectException as ex:
                 self.window.console.writeln("Project is corrupted ({0})".format(ex.message), "err")
 
+    def _on_graph_file_loaded(self, filename, done, count, error):
+        if error:
+            self.window.console.writeln("Graph file skipped ({0})".format(error), "err")
+        else:
+            msg = "Graph '{0}' loaded ({1}/{2})".format(filename, done, count)
+            self.window.console.writeln(msg)
+
     def _open_project(self, project):
         self.project = project
         self.project.saved = True
@@ -77,6 +85,7 @@ class App():
         self.window.create_tab(project_tab)
         self.window.create_tab(simulations_tab)
         self.window.switch_to_tab(project_tab)
+        project.graph_manager.warm_layouts(settings.get("MAX_VISIBLE_GRAPH_NODES"))
 
     def save_project(self):
         if self.project:
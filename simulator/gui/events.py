@@ -19,3 +19,77 @@ class EventSource():
         if event_name in self.callbacks:
             for cb in self.callbacks[event_name]:
                 cb(*(args))
+
+
+def emitter_slots(event_names):
+    """
+    Returns names of slots of emitters of events (see FastEventSource).
+
+    :param: event_names: names of events
+    :type: tuple of str
+    :rtype: tuple of str
+    """
+    return tuple("fire_" + name for name in event_names)
+
+
+class FastEventSource(object):
+    """
+    Event source for frequently fired events. Listeners of each event
+    are compiled to emitter stored in attribute 'fire_<event name>',
+    which is None if event has no listener, listener itself if event
+    has one listener, otherwise function calling all listeners. Hot code
+    calls emitter directly and skips preparing of arguments if emitter
+    is None, 'fire' is kept for other code.
+
+    Subclasses with __slots__ have to contain slots of emitters of their
+    events (see emitter_slots).
+    """
+    __slots__ = ("callbacks",)
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def register_event(self, event_name):
+        self.callbacks[event_name] = []
+        setattr(self, "fire_" + event_name, None)
+
+    def connect(self, event_name, callback):
+        if event_name in self.callbacks:
+            self.callbacks[event_name].append(callback)
+            self._compile(event_name)
+
+    def disconnect(self, event_name):
+        if event_name in self.callbacks:
+            del self.callbacks[event_name]
+            setattr(self, "fire_" + event_name, None)
+
+    def fire(self, event_name, *args):
+        if event_name in self.callbacks:
+            emitter = getattr(self, "fire_" + event_name)
+            if emitter is not None:
+                emitter(*args)
+
+    def wrap_callbacks(self, wrapper):
+        """
+        Replace each listener by result of 'wrapper(listener)'.
+
+        :param: wrapper: function returning new listener
+        :type: Function
+        """
+        for event_name, callbacks in self.callbacks.iteritems():
+            callbacks[:] = [wrapper(cb) for cb in callbacks]
+            self._compile(event_name)
+
+    def _compile(self, event_name):
+        callbacks = self.callbacks[event_name]
+        if not callbacks:
+            emitter = None
+        elif len(callbacks) == 1:
+            emitter = callbacks[0]
+        else:
+            callbacks = tuple(callbacks)
+
+            def emitter(*args):
+                for cb in callbacks:
+                    cb(*args)
+        setattr(self, "fire_" + event_name, emitter)
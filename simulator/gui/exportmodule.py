@@ -70,7 +70,7 @@ class CSVExportDataModule(ExportDataModule):
         while True:
             for pr in processes:
                 lines.append(e)
-                md = measured_data[pr.id]
+                md = measured_data.get(pr.id, [])
                 for d in md:
                     lines.append(e)
                     for entry in d:
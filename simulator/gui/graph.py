@@ -1,9 +1,12 @@
+from array import array
 
 
 class Graph():
     def __init__(self):
         self.nodes = {} # key -> node id, value -> node
         self.root = None
+        self.edge_ids = {} # key -> (source id, target id, label), value -> edge id
+        self.edge_ids_count = 0 # max edge id + 1, edges can have ids from model
 
     def set_root_node(self, id):
         if id in self.nodes:
@@ -16,6 +19,8 @@ class Graph():
 
     def add_node(self, node):
         if node.id not in self.nodes:
+            if node.index is None:
+                node.index = len(self.nodes)
             self.nodes[node.id] = node
         else:
             raise Exception("Node id already exists in graph")
@@ -27,6 +32,10 @@ class Graph():
 
     def add_edge(self, edge):
         if edge.source.id in self.nodes:
+            if edge.edge_id is None:
+                key = (edge.source.id, edge.target.id, edge.label)
+                edge.edge_id = self.edge_ids.setdefault(key, len(self.edge_ids))
+            self.edge_ids_count = max(self.edge_ids_count, edge.edge_id + 1)
             self.nodes[edge.source.id].add_edge(edge)
         else:
             raise Exception("Source node of edge not exists in graph")
@@ -49,12 +58,16 @@ class Graph():
             edges_count += len(node.get_edges())
         return edges_count
 
+    def get_edge_ids_count(self):
+        return self.edge_ids_count
+
 
 class Node():
-    def __init__(self, id, size):
+    def __init__(self, id, size, index = None):
         self.id = id
         self.edges = None
         self.size = size
+        self.index = index # dense id of node used by GraphStats
 
     def get_edges(self):
         if not self.edges:
@@ -72,7 +85,11 @@ class Node():
 
 
 class Edge():
-    def __init__(self, source, target, time, events_count, pids, label):
+    def __init__(self, source, target, time, events_count, pids, label,
+                 edge_id = None):
+        # dense id of edge used by GraphStats, edges with same source,
+        # target and label have same id
+        self.edge_id = edge_id
         self.source = source
         self.target = target
         self.time = time
@@ -99,6 +116,389 @@ class Edge():
         return self.pids
 
 
+class CompactGraph():
+    """
+    Graph with node ids interned to dense integers and edges stored
+    in CSR (compressed sparse row) arrays. Edges of node with index 'i'
+    are stored at positions offsets[i] to offsets[i + 1]. Labels and pids
+    of edges are stored as indexes to tables of unique values.
+
+    Nodes and edges are accessed by lightweight views (CompactNode,
+    CompactEdge) with same interface as Node and Edge. Nodes and edges
+    are added first and graph is made usable by 'build' method.
+
+    Each edge has also dense edge id used by GraphStats. Edges with same
+    source, target and label share edge id.
+
+    Edges can reference nodes which are added later (index of node
+    is reserved by first reference), all referenced nodes must be added
+    before graph is built.
+    """
+    def __init__(self):
+        self.node_ids = [] # index -> node id
+        self.node_index = {} # node id -> index
+        self.sizes = array("d")
+        self.offsets = array("l", [0])
+        self.targets = array("l")
+        self.times = array("d")
+        self.events_counts = array("l")
+        self.labels = array("l")
+        self.pids = array("l")
+        self.edge_ids = array("l")
+        self.edge_ids_count = 0
+        self.label_table = []
+        self.pids_table = []
+        self.root = None
+        self.built = False
+        self._sources = array("l")
+        self._label_index = {}
+        self._pids_index = {}
+        self._reserved = set() # ids of referenced nodes, which were not added
+
+    def _get_node_index(self, id):
+        index = self.node_index.get(id)
+        if index is None:
+            index = len(self.node_ids)
+            self.node_index[id] = index
+            self.node_ids.append(id)
+            self.sizes.append(0)
+            self._reserved.add(id)
+        return index
+
+    def add_node(self, id, size):
+        """
+        Add node to graph.
+
+        :param: id: id of node
+        :type: str
+        :param: size: size of node
+        :type: float
+        :return: index of node
+        :rtype: int
+        """
+        if id in self._reserved:
+            self._reserved.remove(id)
+            index = self.node_index[id]
+            self.sizes[index] = size
+            return index
+        if id in self.node_index:
+            raise Exception("Node id already exists in graph")
+        index = len(self.node_ids)
+        self.node_index[id] = index
+        self.node_ids.append(id)
+        self.sizes.append(size)
+        return index
+
+    def add_edge(self, source_id, target_id, time, events_count, pids, label):
+        """
+        Add edge to graph. Order of edges of each node is preserved.
+
+        :param: source_id: id of source node
+        :type: str
+        :param: target_id: id of target node
+        :type: str
+        :param: time: time of edge
+        :type: float
+        :param: events_count: count of events
+        :type: int
+        :param: pids: pids of edge
+        :type: list of str
+        :param: label: label of edge
+        :type: str
+        """
+        if self.built:
+            raise Exception("Edge can't be added to built graph")
+        self._sources.append(self._get_node_index(source_id))
+        self.targets.append(self._get_node_index(target_id))
+        self.times.append(time)
+        self.events_counts.append(events_count)
+        self.labels.append(self._intern(label, self.label_table, self._label_index))
+        self.pids.append(self._intern(tuple(pids), self.pids_table, self._pids_index))
+
+    def _intern(self, value, table, index):
+        i = index.get(value)
+        if i is None:
+            i = len(table)
+            index[value] = i
+            table.append(value)
+        return i
+
+    def build(self):
+        """
+        Sort added edges by source nodes (stable counting sort)
+        and create offsets of edges.
+        """
+        if self.built:
+            return
+        if self._reserved:
+            raise Exception("Node '{0}' of edge not exists in graph".format(
+                next(iter(self._reserved))))
+        nodes_count = len(self.node_ids)
+        sources = self._sources
+        counts = array("l", [0]) * (nodes_count + 1)
+        for s in sources:
+            counts[s + 1] += 1
+        for i in xrange(nodes_count):
+            counts[i + 1] += counts[i]
+        self.offsets = array("l", counts)
+
+        positions = array("l", [0]) * len(sources)
+        for e, s in enumerate(sources):
+            positions[e] = counts[s]
+            counts[s] += 1
+
+        for name in ("targets", "times", "events_counts", "labels", "pids"):
+            values = getattr(self, name)
+            ordered = array(values.typecode, values)
+            for e, p in enumerate(positions):
+                ordered[p] = values[e]
+            setattr(self, name, ordered)
+
+        self.pids_table = [list(pids) for pids in self.pids_table]
+        self._create_edge_ids()
+        self._sources = array("l")
+        self._label_index = {}
+        self._pids_index = {}
+        self.built = True
+
+    def _create_edge_ids(self):
+        offsets = self.offsets
+        targets = self.targets
+        labels = self.labels
+        edge_ids = array("l", [0]) * len(targets)
+        next_id = 0
+        for i in xrange(len(self.node_ids)):
+            # same edges can have only same source node
+            ids = {}
+            for e in xrange(offsets[i], offsets[i + 1]):
+                key = (targets[e], labels[e])
+                edge_id = ids.get(key)
+                if edge_id is None:
+                    edge_id = next_id
+                    ids[key] = edge_id
+                    next_id += 1
+                edge_ids[e] = edge_id
+        self.edge_ids = edge_ids
+        self.edge_ids_count = next_id
+
+    def set_root_node(self, id):
+        index = self.node_index.get(id)
+        if index is None or id in self._reserved:
+            raise Exception("Invalid root node id")
+        self.root = CompactNode(self, index)
+
+    def get_root(self):
+        return self.root
+
+    def get_node(self, id):
+        index = self.node_index.get(id)
+        if index is None:
+            return None
+        return CompactNode(self, index)
+
+    def get_node_by_index(self, index):
+        return CompactNode(self, index)
+
+    def get_edge(self, source_node_id, target_node_id):
+        source = self.node_index.get(source_node_id)
+        target = self.node_index.get(target_node_id)
+        if source is None or target is None:
+            return None
+        targets = self.targets
+        for e in xrange(self.offsets[source], self.offsets[source + 1]):
+            if targets[e] == target:
+                return CompactEdge(self, e, source)
+        return None
+
+    @property
+    def nodes(self):
+        return CompactNodes(self)
+
+    def get_nodes_count(self):
+        return len(self.node_ids)
+
+    def get_edges_count(self):
+        return len(self.targets)
+
+    def get_edge_ids_count(self):
+        return self.edge_ids_count
+
+    def get_memory_size(self):
+        """
+        Returns estimated memory size of graph in bytes.
+
+        :return: memory size
+        :rtype: int
+        """
+        size = 0
+        for values in (self.sizes, self.offsets, self.targets, self.times,
+                       self.events_counts, self.labels, self.pids,
+                       self.edge_ids):
+            size += values.itemsize * len(values)
+        # node id string, its reference in list and entry in node_index
+        size += sum(len(id) + 120 for id in self.node_ids)
+        return size
+
+
+class CompactNodes():
+    """
+    Read only mapping of node ids to nodes of CompactGraph.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.node_ids)
+
+    def __contains__(self, id):
+        return id in self.graph.node_index
+
+    def __getitem__(self, id):
+        return CompactNode(self.graph, self.graph.node_index[id])
+
+    def __iter__(self):
+        return iter(self.graph.node_ids)
+
+    def get(self, id, default = None):
+        index = self.graph.node_index.get(id)
+        if index is None:
+            return default
+        return CompactNode(self.graph, index)
+
+    def keys(self):
+        return list(self.graph.node_ids)
+
+    def itervalues(self):
+        graph = self.graph
+        for i in xrange(len(graph.node_ids)):
+            yield CompactNode(graph, i)
+
+    def values(self):
+        return list(self.itervalues())
+
+    def iteritems(self):
+        for node in self.itervalues():
+            yield node.id, node
+
+    def items(self):
+        return list(self.iteritems())
+
+
+class CompactNode(object):
+    """
+    View of node of CompactGraph with interface of Node.
+    """
+    __slots__ = ("graph", "index")
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    @property
+    def id(self):
+        return self.graph.node_ids[self.index]
+
+    @property
+    def size(self):
+        return self.graph.sizes[self.index]
+
+    @property
+    def edges(self):
+        return self.get_edges()
+
+    def get_edges(self):
+        graph = self.graph
+        index = self.index
+        return [CompactEdge(graph, e, index)
+                for e in xrange(graph.offsets[index], graph.offsets[index + 1])]
+
+    def get_size(self):
+        return self.graph.sizes[self.index]
+
+    def get_id(self):
+        return self.graph.node_ids[self.index]
+
+    def __eq__(self, other):
+        return (isinstance(other, CompactNode) and
+                self.index == other.index and
+                self.graph is other.graph)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return self.index
+
+
+class CompactEdge(object):
+    """
+    View of edge of CompactGraph with interface of Edge.
+    """
+    __slots__ = ("graph", "index", "source_index")
+
+    def __init__(self, graph, index, source_index):
+        self.graph = graph
+        self.index = index
+        self.source_index = source_index
+
+    @property
+    def source(self):
+        return CompactNode(self.graph, self.source_index)
+
+    @property
+    def target(self):
+        return CompactNode(self.graph, self.graph.targets[self.index])
+
+    @property
+    def time(self):
+        return self.graph.times[self.index]
+
+    @property
+    def events_count(self):
+        return self.graph.events_counts[self.index]
+
+    @property
+    def pids(self):
+        return self.graph.pids_table[self.graph.pids[self.index]]
+
+    @property
+    def label(self):
+        return self.graph.label_table[self.graph.labels[self.index]]
+
+    @property
+    def edge_id(self):
+        return self.graph.edge_ids[self.index]
+
+    def get_source(self):
+        return CompactNode(self.graph, self.source_index)
+
+    def get_target(self):
+        return CompactNode(self.graph, self.graph.targets[self.index])
+
+    def get_time(self):
+        return self.graph.times[self.index]
+
+    def get_label(self):
+        return self.graph.label_table[self.graph.labels[self.index]]
+
+    def get_events_count(self):
+        return self.graph.events_counts[self.index]
+
+    def get_pids(self):
+        return self.graph.pids_table[self.graph.pids[self.index]]
+
+    def __eq__(self, other):
+        return (isinstance(other, CompactEdge) and
+                self.index == other.index and
+                self.graph is other.graph)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return self.index
+
+
 class VisibleGraph(Graph):
     def __init__(self, scale, width, height):
         Graph.__init__(self)
@@ -112,8 +512,8 @@ class VisibleGraph(Graph):
 
 
 class VisibleNode(Node):
-    def __init__(self, id, size, x, y, width, height):
-        Node.__init__(self, id, size)
+    def __init__(self, id, size, x, y, width, height, index = None):
+        Node.__init__(self, id, size, index)
         self.x = x
         self.y = y
         self.width = width
@@ -147,8 +547,9 @@ class VisibleNode(Node):
 
 class VisibleEdge(Edge):
     def __init__(self, source, target, time, events_count, pids, label,
-                 lx, ly, points, arrow_polygon):
-        Edge.__init__(self, source, target, time, events_count, pids, label)
+                 lx, ly, points, arrow_polygon, edge_id = None):
+        Edge.__init__(self, source, target, time, events_count, pids, label,
+                      edge_id)
         self.lx = lx
         self.ly = ly
         self.label = label
@@ -0,0 +1,244 @@
+"""
+Binary cache of graphs. Graph loaded from XML file is stored next to it
+('graph.xml.simgraph') and later loads read the cache instead of parsing
+XML file.
+
+Cache file consists of magic string, length of header, header in JSON
+format (information about source file, tables of labels and pids, root
+node and sections) and sections with arrays of CompactGraph and node ids.
+Cache is valid only if size, modification time and fingerprint (hash
+of beginning and end) of source file are same as in header. Truncated
+or damaged cache is treated as invalid cache.
+
+Sections are read by buffered reads directly into arrays (array.fromfile),
+arrays of CompactGraph are not backed by cache file.
+"""
+import os
+import json
+import struct
+import hashlib
+from array import array
+import graph as g
+
+VERSION = 1
+MAGIC = "SIMGRAPH"
+SUFFIX = ".simgraph"
+FINGERPRINT_BLOCK = 64 * 1024
+
+LENGTH = struct.Struct("<I")
+
+ARRAYS = ["sizes", "offsets", "targets", "times", "events_counts",
+          "labels", "pids", "edge_ids"]
+
+
+def get_cache_filename(filename):
+    return filename + SUFFIX
+
+
+def get_fingerprint(filename):
+    """
+    Returns hash of beginning and end of file.
+
+    :param: filename: name of file
+    :type: str
+    :return: hex digest
+    :rtype: str
+    """
+    h = hashlib.sha1()
+    with open(filename, "rb") as f:
+        h.update(f.read(FINGERPRINT_BLOCK))
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size > FINGERPRINT_BLOCK:
+            f.seek(max(FINGERPRINT_BLOCK, size - FINGERPRINT_BLOCK))
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def get_source_info(filename):
+    st = os.stat(filename)
+    return {"size": st.st_size,
+            "mtime": st.st_mtime,
+            "fingerprint": get_fingerprint(filename)}
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return value
+
+
+def _decode(value):
+    # keep ascii strings as str, like ElementTree does
+    if isinstance(value, unicode):
+        try:
+            return value.encode("ascii")
+        except UnicodeEncodeError:
+            pass
+    return value
+
+
+def write_graph_cache(graph, filename):
+    """
+    Write cache of graph loaded from 'filename'. Cache is written
+    to temporary file, which replaces old cache.
+
+    :param: graph: built graph
+    :type: CompactGraph
+    :param: filename: name of source XML file
+    :type: str
+    """
+    node_ids = "\0".join(_encode(id) for id in graph.node_ids)
+    sections = []
+    data = []
+    offset = 0
+    for name in ARRAYS:
+        values = getattr(graph, name)
+        raw = values.tostring()
+        sections.append({"name": name,
+                         "typecode": values.typecode,
+                         "itemsize": values.itemsize,
+                         "offset": offset,
+                         "length": len(raw)})
+        data.append(raw)
+        offset += len(raw)
+    sections.append({"name": "node_ids",
+                     "offset": offset,
+                     "length": len(node_ids)})
+    data.append(node_ids)
+
+    header = {"version": VERSION,
+              "source": get_source_info(filename),
+              "root": graph.root.index if graph.root else None,
+              "edge_ids_count": graph.edge_ids_count,
+              "label_table": graph.label_table,
+              "pids_table": graph.pids_table,
+              "sections": sections}
+    header = json.dumps(header)
+
+    cache_filename = get_cache_filename(filename)
+    tmp_filename = cache_filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        f.write(MAGIC)
+        f.write(LENGTH.pack(len(header)))
+        f.write(header)
+        for raw in data:
+            f.write(raw)
+    os.rename(tmp_filename, cache_filename)
+
+
+def _read_header(f, filename):
+    if f.read(len(MAGIC)) != MAGIC:
+        return None
+    raw = f.read(LENGTH.size)
+    if len(raw) != LENGTH.size:
+        return None
+    length = LENGTH.unpack(raw)[0]
+    raw = f.read(length)
+    if len(raw) != length:
+        return None
+    try:
+        header = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get("version") != VERSION:
+        return None
+    if not isinstance(header.get("sections"), list):
+        return None
+    if header.get("source") != get_source_info(filename):
+        return None
+    return header
+
+
+def load_graph_info(filename):
+    """
+    Read counts of nodes and edges from header of cache of 'filename'.
+
+    :param: filename: name of source XML file
+    :type: str
+    :return: (nodes count, edges count) or None if cache not exists\
+    or is not valid
+    :rtype: tuple | None
+    """
+    cache_filename = get_cache_filename(filename)
+    if not os.path.exists(cache_filename):
+        return None
+
+    with open(cache_filename, "rb") as f:
+        header = _read_header(f, filename)
+    if header is None:
+        return None
+    sections = dict((s.get("name"), s) for s in header["sections"]
+                    if isinstance(s, dict))
+    try:
+        offsets = sections["offsets"]
+        targets = sections["targets"]
+        return (offsets["length"] / offsets["itemsize"] - 1,
+                targets["length"] / targets["itemsize"])
+    except (KeyError, TypeError, ZeroDivisionError):
+        return None
+
+
+def load_graph_cache(filename):
+    """
+    Load graph from cache of 'filename'.
+
+    :param: filename: name of source XML file
+    :type: str
+    :return: graph or None if cache not exists or is not valid
+    :rtype: CompactGraph | None
+    """
+    cache_filename = get_cache_filename(filename)
+    if not os.path.exists(cache_filename):
+        return None
+
+    graph = g.CompactGraph()
+    with open(cache_filename, "rb") as f:
+        header = _read_header(f, filename)
+        if header is None:
+            return None
+        start = f.tell()
+        try:
+            names = set(section["name"] for section in header["sections"])
+            if not names.issuperset(ARRAYS + ["node_ids"]):
+                return None
+            for section in header["sections"]:
+                f.seek(start + section["offset"])
+                length = section["length"]
+                name = section["name"]
+                if name == "node_ids":
+                    raw = f.read(length)
+                    if len(raw) != length:
+                        return None
+                    node_ids = raw.split("\0") if raw else []
+                    if not _is_ascii(raw):
+                        node_ids = [_decode(id.decode("utf-8")) for id in node_ids]
+                    graph.node_ids = node_ids
+                else:
+                    values = array(str(section["typecode"]))
+                    if (values.itemsize != section["itemsize"] or
+                            length % values.itemsize):
+                        return None
+                    values.fromfile(f, length / values.itemsize)
+                    setattr(graph, name, values)
+        except (EOFError, KeyError, TypeError, ValueError):
+            # truncated file or damaged description of sections
+            return None
+
+    graph.node_index = dict((id, i) for i, id in enumerate(graph.node_ids))
+    graph.edge_ids_count = header["edge_ids_count"]
+    graph.label_table = [_decode(label) for label in header["label_table"]]
+    graph.pids_table = [[_decode(pid) for pid in pids]
+                        for pids in header["pids_table"]]
+    graph.built = True
+    if header["root"] is not None:
+        graph.root = graph.get_node_by_index(header["root"])
+    return graph
+
+
+def _is_ascii(raw):
+    try:
+        raw.decode("ascii")
+        return True
+    except UnicodeDecodeError:
+        return False
@@ -1,17 +1,136 @@
 import os
+from array import array
+from itertools import izip
 from random import Random
-from graph import Edge, Node, Graph
-from xml.etree.cElementTree import Element, SubElement
-from simulator.misc import utils
+from xml.sax.saxutils import escape
+from graph import CompactGraph
+import graphcache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ROOT_ID = "init"
+TOPOLOGIES = ["random", "layered", "tree", "powerlaw", "lattice"]
+
+
+class XMLGraphWriter():
+    """
+    Writes graph node by node to XML file (same format as pretty printed
+    document), so whole graph is never in memory. Times are written
+    exactly (repr), so graph loaded from file is same as generated graph.
+
+    :param: filename: name of XML file
+    :type: str
+    """
+    ARC = "    <arc events-count=\"{0}\" label=\"{1}\" node-id=\"{2}\" pids=\"{3}\" time=\"{4!r}\"/>\n"
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.f = None
+
+    def start(self, root_id):
+        self.f = open(self.filename, "w")
+        self.f.write("<?xml version=\"1.0\" ?>\n")
+        self.f.write("<statespace init-node-id=\"{0}\">\n".format(_quote(root_id)))
+
+    def add_node(self, id, size, edges):
+        """
+        :param: id: id of node
+        :type: str
+        :param: size: size of node
+        :type: int
+        :param: edges: edges of node
+        :type: list of (target id, time, events count, pids, label)
+        """
+        node = "  <node id=\"{0}\" size=\"{1}\"".format(_quote(id), size)
+        if not edges:
+            self.f.write(node + "/>\n")
+            return
+
+        lines = [node + ">\n"]
+        arc = self.ARC.format
+        for target_id, time, events_count, pids, label in edges:
+            lines.append(arc(events_count, _quote(label), _quote(target_id),
+                             _quote(pids), float(time)))
+        lines.append("  </node>\n")
+        self.f.write("".join(lines))
+
+    def end(self):
+        self.f.write("</statespace>\n")
+        self.f.close()
+        self.f = None
+
+
+class CompactGraphWriter():
+    """
+    Builds CompactGraph from generated nodes. Values are converted same
+    way as GraphLoader converts values from XML file.
+    """
+    def __init__(self):
+        self.graph = CompactGraph()
+        self.root_id = None
+
+    def start(self, root_id):
+        self.root_id = root_id
+
+    def add_node(self, id, size, edges):
+        self.graph.add_node(id, float(size))
+        for target_id, time, events_count, pids, label in edges:
+            self.graph.add_edge(id, target_id, float(time), events_count,
+                                pids.split(","), label)
+
+    def end(self):
+        self.graph.set_root_node(self.root_id)
+        self.graph.build()
+
+    def get_graph(self):
+        return self.graph
 
 
 class GraphGenerator():
-    def __init__(self, filename, nodes_count, edges_count, properties, seed = -1):
+    """
+    Generator of random state spaces. Nodes are generated one by one
+    with their edges and streamed to writers. Node 'init' is root
+    and other nodes have ids '1', '2', ... 'nodes_count - 1'.
+
+    Topology is given by property 'topology':
+        - random: edges between uniformly chosen nodes
+        - layered: DAG, edges go from layer to next layer\
+        (property 'layers', default square root of nodes count)
+        - tree: tree with 'branching' children of each node (default 2)\
+        and back edges to ancestors (edges_count must be at least nodes_count - 1)
+        - powerlaw: out-degrees of nodes follow power-law distribution\
+        with exponent 'alpha' (default 2.0)
+        - lattice: state space of 'dimensions' counters (default 2),\
+        largest hypercube with at most nodes_count nodes, edges_count is ignored
+
+    If NumPy is installed, graph is generated by vectorised path: all
+    endpoints, times and events counts are drawn in bulk arrays and
+    CompactGraph is created directly from them. Same seed gives same
+    graph in each path, but paths give different graphs.
+
+    :param: seed: seed of random generator, -1 for random seed
+    :type: int
+    :param: use_numpy: use vectorised path (if None, it is used when NumPy\
+    is installed)
+    :type: bool | None
+    """
+    def __init__(self, filename, nodes_count, edges_count, properties, seed = -1,
+                 use_numpy = None):
         self.filename = filename
         self.nodes_count = nodes_count
         self.edges_count = edges_count
         self.properties = properties
-        self.r = Random() if seed != -1 else Random(seed)
+        self.topology = properties.get("topology", "random")
+        self.seed = seed
+        self.r = Random(seed) if seed != -1 else Random()
+        if use_numpy is None:
+            use_numpy = np is not None
+        elif use_numpy and np is None:
+            raise Exception("NumPy is not installed")
+        self.use_numpy = use_numpy
 
         if filename == "":
             raise Exception("Filename is empty")
@@ -22,62 +141,374 @@ class GraphGenerator():
         if os.path.exists(filename):
             raise Exception(filename + " already exists")
 
+        if nodes_count < 1:
+            raise Exception("Nodes count must be greater than 0")
+
+        if edges_count < 0:
+            raise Exception("Edges count can't be smaller than 0")
+
+        if self.topology not in TOPOLOGIES:
+            raise Exception("Unknown graph topology '{0}'".format(self.topology))
+
+        self._check_properties()
         self.filename = os.path.abspath(filename)
 
+    def _check_properties(self):
+        get = self.properties.get
+        if self.topology == "layered" and self.nodes_count < 2:
+            raise Exception("Layered graph must have at least 2 nodes")
+        if self.topology == "tree":
+            if get("branching", 2) < 1:
+                raise Exception("Branching of tree must be greater than 0")
+            if self.edges_count < self.nodes_count - 1:
+                raise Exception("Tree with {0} nodes must have at least {1} edges".format(
+                    self.nodes_count, self.nodes_count - 1))
+        if self.topology == "powerlaw" and get("alpha", 2.0) <= 1:
+            raise Exception("Exponent of power-law distribution must be greater than 1")
+        if self.topology == "lattice" and get("dimensions", 2) < 1:
+            raise Exception("Lattice must have at least 1 dimension")
+
     def generate_graph(self):
-        graph = Graph()
-        root_node = Node("init", self.next_node_size())
-        graph.add_node(root_node)
-        for i in xrange(self.nodes_count - 1):
-            name = str(i + 1)
-            graph.add_node(Node(name, self.next_node_size()))
-
-        nodes = graph.nodes.values()
-        for _ in xrange(self.edges_count):
-            source_n = nodes[self.r.randint(0, len(nodes) - 1)]
-            dest_n = nodes[self.r.randint(0, len(nodes) - 1)]
-            time = self.r.random()
-            events_count = self.r.randint(1, 1000)
-            pids = ""
-            label = source_n.get_id() + "/" + dest_n.get_id()
-            graph.add_edge(Edge(source_n, dest_n, time, events_count, pids, label))
-
-        graph.set_root_node("init")
-        return graph
+        if self.use_numpy:
+            return self._generate_compact_graph()
+        writer = CompactGraphWriter()
+        self.write(writer)
+        return writer.get_graph()
+
+    def write(self, *writers):
+        """
+        Generate graph to writers.
+
+        :param: writers: writers of graph (XMLGraphWriter, CompactGraphWriter)
+        """
+        self._write_nodes(self.iter_nodes(), writers)
+
+    def _write_nodes(self, nodes, writers):
+        for writer in writers:
+            writer.start(ROOT_ID)
+        for id, size, edges in nodes:
+            for writer in writers:
+                writer.add_node(id, size, edges)
+        for writer in writers:
+            writer.end()
+
+    def iter_nodes(self):
+        """
+        Returns generator of nodes.
+
+        :return: generator of (id, size, edges)
+        :rtype: generator
+        """
+        if self.use_numpy:
+            return self._iter_arrays_nodes(self._generate_arrays())
+        return getattr(self, "_iter_" + self.topology)()
 
     def next_node_size(self):
-        return self.r.randint(0, 10)
+        return int(self.r.random() * 11)
+
+    def _node_id(self, index):
+        if index == 0:
+            return ROOT_ID
+        return str(index)
 
-    def create_graph(self):
-        graph = self.generate_graph()
-        self.save_graph(self.filename, graph)
+    def _create_node(self, index, targets):
+        rand = self.r.random
+        node_id = self._node_id(index)
+        size = self.next_node_size()
+        edges = []
+        for target in targets:
+            target_id = self._node_id(target)
+            edges.append((target_id,
+                          rand(),
+                          1 + int(rand() * 1000),
+                          "",
+                          node_id + "/" + target_id))
+        return node_id, size, edges
+
+    def _distribute(self, total, count):
+        # counts of items in 'count' bins, bin of each item is chosen uniformly
+        counts = array("l", [0]) * count
+        rand = self.r.random
+        for _ in xrange(total):
+            counts[int(rand() * count)] += 1
+        return counts
+
+    def _iter_random(self):
+        n = self.nodes_count
+        rand = self.r.random
+        out_degrees = self._distribute(self.edges_count, n)
+        for i in xrange(n):
+            targets = [int(rand() * n) for _ in xrange(out_degrees[i])]
+            yield self._create_node(i, targets)
+
+    def _iter_layered(self):
+        n = self.nodes_count
+        layers = self.properties.get("layers") or int(round(n ** 0.5))
+        layers = min(max(layers, 2), n)
+        bounds = [k * n // layers for k in xrange(layers + 1)]
+        rand = self.r.random
+        out_degrees = self._distribute(self.edges_count, bounds[layers - 1])
+        layer = 0
+        for i in xrange(n):
+            if i == bounds[layer + 1]:
+                layer += 1
+            targets = []
+            if layer < layers - 1:
+                start = bounds[layer + 1]
+                width = bounds[layer + 2] - start
+                targets = [start + int(rand() * width) for _ in xrange(out_degrees[i])]
+            yield self._create_node(i, targets)
+
+    def _iter_tree(self):
+        n = self.nodes_count
+        branching = self.properties.get("branching", 2)
+        back_edges = self.edges_count - (n - 1)
+        rand = self.r.random
+        out_degrees = self._distribute(back_edges, n)
+        for i in xrange(n):
+            first = i * branching + 1
+            targets = range(first, min(first + branching, n))
+            if out_degrees[i]:
+                ancestors = [i]
+                while ancestors[-1] > 0:
+                    ancestors.append((ancestors[-1] - 1) // branching)
+                for _ in xrange(out_degrees[i]):
+                    targets.append(ancestors[int(rand() * len(ancestors))])
+            yield self._create_node(i, targets)
+
+    def _iter_powerlaw(self):
+        n = self.nodes_count
+        alpha = self.properties.get("alpha", 2.0)
+        rand = self.r.random
+        weights = array("d", (self.r.paretovariate(alpha - 1) for _ in xrange(n)))
+        scale = self.edges_count / sum(weights)
+        out_degrees = array("l", (int(w * scale) for w in weights))
+        del weights
+        for _ in xrange(self.edges_count - sum(out_degrees)):
+            out_degrees[int(rand() * n)] += 1
+        for i in xrange(n):
+            targets = [int(rand() * n) for _ in xrange(out_degrees[i])]
+            yield self._create_node(i, targets)
+
+    def _iter_lattice(self):
+        dimensions = self.properties.get("dimensions", 2)
+        side = max(1, int(self.nodes_count ** (1.0 / dimensions)))
+        while (side + 1) ** dimensions <= self.nodes_count:
+            side += 1
+        steps = [side ** d for d in xrange(dimensions)]
+        for i in xrange(side ** dimensions):
+            # increment of each counter, which is not at maximum
+            targets = [i + step for step in steps if (i // step) % side < side - 1]
+            yield self._create_node(i, targets)
+
+    def _generate_arrays(self):
+        # arrays of graph in order of generated nodes
+        rng = np.random.RandomState(self.seed) if self.seed != -1 else np.random.RandomState()
+        out_degrees, targets = getattr(self, "_numpy_" + self.topology)(rng)
+        n = len(out_degrees)
+        m = len(targets)
+        node_ids = [self._node_id(i) for i in xrange(n)]
+        sizes = rng.randint(0, 11, n)
+        times = rng.random_sample(m)
+        events_counts = rng.randint(1, 1001, m)
+        offsets = np.concatenate(([0], np.cumsum(out_degrees))).astype(np.int64)
+
+        # labels ('source/target') are interned in order of edges
+        sources = np.repeat(np.arange(n, dtype = np.int64), out_degrees)
+        labels, first = _first_occurrence_ranks(sources * n + targets)
+        ids = np.array(node_ids)
+        label_table = np.char.add(np.char.add(ids[sources[first]], "/"),
+                                  ids[targets[first]]).tolist()
+        return node_ids, sizes, offsets, targets, times, events_counts, labels, label_table
+
+    def _generate_compact_graph(self):
+        return self._create_compact_graph(self._generate_arrays())
+
+    def _create_compact_graph(self, arrays):
+        """
+        Create CompactGraph from generated arrays. Nodes are indexed
+        in order of first reference in XML file, so graph is same as graph
+        loaded from generated file by GraphLoader.
+        """
+        node_ids, sizes, offsets, targets, times, events_counts, labels, label_table = arrays
+        n = len(node_ids)
+        m = len(targets)
+        sequence = np.empty(n + m, dtype = np.int64)
+        node_positions = offsets[:-1] + np.arange(n)
+        is_target = np.ones(n + m, dtype = bool)
+        is_target[node_positions] = False
+        sequence[node_positions] = np.arange(n)
+        sequence[is_target] = targets
+        _, first = np.unique(sequence, return_index = True)
+        order = np.argsort(first, kind = "mergesort") # new index -> old index
+        new_index = np.empty(n, dtype = np.int64)
+        new_index[order] = np.arange(n)
+
+        out_degrees = np.diff(offsets)[order]
+        new_offsets = np.concatenate(([0], np.cumsum(out_degrees))).astype(np.int64)
+        edges = np.arange(m, dtype = np.int64) + np.repeat(offsets[:-1][order] - new_offsets[:-1],
+                                                           out_degrees)
+        new_targets = new_index[targets[edges]]
+        sources = np.repeat(np.arange(n, dtype = np.int64), out_degrees)
+        edge_ids, first = _first_occurrence_ranks(sources * n + new_targets)
+
+        graph = CompactGraph()
+        graph.node_ids = [node_ids[i] for i in order]
+        graph.node_index = dict((id, i) for i, id in enumerate(graph.node_ids))
+        graph.sizes = _to_array("d", sizes[order])
+        graph.offsets = _to_array("l", new_offsets)
+        graph.targets = _to_array("l", new_targets)
+        graph.times = _to_array("d", times[edges])
+        graph.events_counts = _to_array("l", events_counts[edges])
+        graph.labels = _to_array("l", labels[edges])
+        graph.pids = array("l", [0]) * m
+        graph.edge_ids = _to_array("l", edge_ids)
+        graph.edge_ids_count = len(first)
+        graph.label_table = label_table
+        graph.pids_table = [[""]] if m else []
+        graph.built = True
+        graph.set_root_node(ROOT_ID)
+        return graph
+
+    def _iter_arrays_nodes(self, arrays):
+        node_ids, sizes, offsets, targets, times, events_counts, labels, label_table = arrays
+        for i in xrange(len(node_ids)):
+            start, end = offsets[i], offsets[i + 1]
+            edges = [(node_ids[t], time, events_count, "", label_table[l])
+                     for t, time, events_count, l in izip(targets[start:end].tolist(),
+                                                          times[start:end].tolist(),
+                                                          events_counts[start:end].tolist(),
+                                                          labels[start:end].tolist())]
+            yield node_ids[i], int(sizes[i]), edges
+
+    def _numpy_random(self, rng):
+        n = self.nodes_count
+        out_degrees = np.bincount(rng.randint(0, n, self.edges_count), minlength = n)
+        return out_degrees, rng.randint(0, n, self.edges_count).astype(np.int64)
+
+    def _numpy_layered(self, rng):
+        n = self.nodes_count
+        layers = self.properties.get("layers") or int(round(n ** 0.5))
+        layers = min(max(layers, 2), n)
+        bounds = np.arange(layers + 1, dtype = np.int64) * n // layers
+        out_degrees = np.bincount(rng.randint(0, bounds[layers - 1], self.edges_count),
+                                  minlength = n)
+        sources = np.repeat(np.arange(n, dtype = np.int64), out_degrees)
+        source_layers = np.searchsorted(bounds, sources, side = "right") - 1
+        starts = bounds[source_layers + 1]
+        widths = bounds[source_layers + 2] - starts
+        targets = starts + (rng.random_sample(len(sources)) * widths).astype(np.int64)
+        return out_degrees, targets
+
+    def _numpy_tree(self, rng):
+        n = self.nodes_count
+        branching = self.properties.get("branching", 2)
+        back_edges = self.edges_count - (n - 1)
+        children = np.arange(1, n, dtype = np.int64)
+        parents = (children - 1) // branching
+        back_sources = np.sort(rng.randint(0, n, back_edges)).astype(np.int64)
+
+        # random ancestor of each back edge source (or source itself)
+        depths = np.zeros(back_edges, dtype = np.int64)
+        nodes = back_sources.copy()
+        while nodes.any():
+            mask = nodes > 0
+            nodes[mask] = (nodes[mask] - 1) // branching
+            depths[mask] += 1
+        steps = (rng.random_sample(back_edges) * (depths + 1)).astype(np.int64)
+        back_targets = back_sources.copy()
+        for step in xrange(int(steps.max()) if back_edges else 0):
+            mask = steps > step
+            back_targets[mask] = (back_targets[mask] - 1) // branching
+
+        # tree edges are before back edges of each node
+        sources = np.concatenate((parents, back_sources))
+        targets = np.concatenate((children, back_targets))
+        order = np.argsort(sources, kind = "mergesort")
+        return np.bincount(sources, minlength = n), targets[order]
+
+    def _numpy_powerlaw(self, rng):
+        n = self.nodes_count
+        alpha = self.properties.get("alpha", 2.0)
+        weights = rng.pareto(alpha - 1, n) + 1
+        out_degrees = (weights * (self.edges_count / weights.sum())).astype(np.int64)
+        rest = self.edges_count - int(out_degrees.sum())
+        out_degrees += np.bincount(rng.randint(0, n, rest), minlength = n)
+        return out_degrees, rng.randint(0, n, self.edges_count).astype(np.int64)
+
+    def _numpy_lattice(self, rng):
+        dimensions = self.properties.get("dimensions", 2)
+        side = max(1, int(self.nodes_count ** (1.0 / dimensions)))
+        while (side + 1) ** dimensions <= self.nodes_count:
+            side += 1
+        nodes = np.arange(side ** dimensions, dtype = np.int64)
+        steps = side ** np.arange(dimensions, dtype = np.int64)
+        valid = (nodes[:, None] // steps) % side < side - 1
+        targets = (nodes[:, None] + steps)[valid]
+        return valid.sum(axis = 1), targets
+
+    def create_graph(self, write_cache = False):
+        """
+        Generate graph to file.
+
+        :param: write_cache: write binary cache of graph (graphcache) too
+        :type: bool
+        :return: name of graph file
+        :rtype: str
+        """
+        if self.use_numpy:
+            arrays = self._generate_arrays()
+            self._write_nodes(self._iter_arrays_nodes(arrays),
+                              [XMLGraphWriter(self.filename)])
+            if write_cache:
+                graphcache.write_graph_cache(self._create_compact_graph(arrays),
+                                             self.filename)
+            return self.filename
+
+        if not write_cache:
+            self.write(XMLGraphWriter(self.filename))
+            return self.filename
+
+        compact_writer = CompactGraphWriter()
+        self.write(XMLGraphWriter(self.filename), compact_writer)
+        graphcache.write_graph_cache(compact_writer.get_graph(), self.filename)
         return self.filename
 
     def save_graph(self, filename, graph):
-        root = Element("statespace")
-        root.set("init-node-id", graph.get_root().get_id())
-
-        def save_node(node):
-            node_el = SubElement(root, "node")
-            node_el.set("id", str(node.get_id()))
-            node_el.set("size", str(node.get_size()))
-            return node_el
-
-        def save_edge(edge, parent_node_el):
-            edge_el = SubElement(parent_node_el, "arc")
-            edge_el.set("node-id", edge.get_target().get_id())
-            edge_el.set("label", edge.get_label())
-            edge_el.set("events-count", str(edge.get_events_count()))
-            edge_el.set("time", str(edge.get_time()))
-            edge_el.set("pids", str(edge.get_pids()))
-            return edge_el
-
+        writer = XMLGraphWriter(filename)
+        writer.start(graph.get_root().get_id())
         for n in graph.nodes.values():
-            n_el = save_node(n)
-            for e in n.get_edges():
-                save_edge(e, n_el)
+            edges = [(e.get_target().get_id(),
+                      e.get_time(),
+                      e.get_events_count(),
+                      ",".join(e.get_pids()),
+                      e.get_label()) for e in n.get_edges()]
+            writer.add_node(n.get_id(), n.get_size(), edges)
+        writer.end()
+
+
+def _quote(value):
+    value = str(value)
+    if "&" in value or "<" in value or ">" in value or "\"" in value:
+        return escape(value, {"\"": "&quot;"})
+    return value
+
+
+def _first_occurrence_ranks(keys):
+    """
+    Number keys in order of their first occurrence.
+
+    :return: (rank of each key, positions of first occurrences in order)
+    :rtype: tuple
+    """
+    _, first, inverse = np.unique(keys, return_index = True, return_inverse = True)
+    order = np.argsort(first, kind = "mergesort")
+    ranks = np.empty(len(first), dtype = np.int64)
+    ranks[order] = np.arange(len(first))
+    return ranks[inverse], first[order]
 
-        with open(self.filename, "w") as f:
-            f.write(utils.get_pretty_xml(root))
-            f.flush()
 
+def _to_array(typecode, values):
+    result = array(typecode)
+    result.fromstring(np.ascontiguousarray(values, dtype = typecode).tostring())
+    return result
@@ -1,3 +1,4 @@
+import collections
 import xml.etree.cElementTree as ET
 import graph as g
 from xml.etree.ElementTree import QName
@@ -6,8 +7,7 @@ from exceptions import GraphException, VisibleGraphException
 
 class AbstractGraphLoader():
     def __init__(self, filename):
-        self.tree = ET.parse(filename);
-        self.root_el = self.tree.getroot()
+        self.filename = filename
         self.graph = None
 
     def solve_graph(self):
@@ -24,10 +24,15 @@ class AbstractGraphLoader():
 
 
 class GraphLoader(AbstractGraphLoader):
+    """
+    Streaming loader of graph. XML file is parsed by iterparse and each
+    node element is removed after its arcs are added to graph, so memory
+    used by loading is proportional to graph, not to XML file. Edges can
+    reference nodes defined later in file.
+    """
     def __init__(self, filename):
         AbstractGraphLoader.__init__(self, filename)
-        self.graph = g.Graph()
-        self.edges = []
+        self.graph = g.CompactGraph()
 
     def load(self):
         try:
@@ -37,25 +42,26 @@ class GraphLoader(AbstractGraphLoader):
             raise GraphException(ex.message)
 
     def solve_graph(self):
-        self.root_node_id = self.root_el.get("init-node-id")
-        nodes = self.root_el.findall("node")
+        context = iter(ET.iterparse(self.filename, events = ("start", "end")))
+        _, root_el = next(context)
+        self.root_node_id = root_el.get("init-node-id")
 
-        for node in nodes:
-            self.solve_node(node)
+        for event, el in context:
+            if event == "end" and el.tag == "node":
+                self.solve_node(el)
+                # remove solved node elements from root element
+                del root_el[:]
 
         self.graph.set_root_node(self.root_node_id)
-        for source_node_id, edge_el in self.edges:
-            self.solve_edge(source_node_id, edge_el)
+        self.graph.build()
 
     def solve_node(self, node):
         node_id = node.get("id")
         size = float(node.get("size"))
-        edges_elements = node.findall("arc")
-
-        for edge_el in edges_elements:
-            self.edges.append((node_id, edge_el))
+        self.graph.add_node(node_id, size)
 
-        self.graph.add_node(g.Node(node_id, size))
+        for edge_el in node.findall("arc"):
+            self.solve_edge(node_id, edge_el)
 
     def solve_edge(self, source_node_id, edge_el):
         target_node_id = edge_el.get("node-id")
@@ -63,14 +69,15 @@ class GraphLoader(AbstractGraphLoader):
         events_count = int(edge_el.get("events-count"))
         time = float(edge_el.get("time"))
         pids = edge_el.get("pids").split(",")
-        source_node = self.graph.get_node(source_node_id)
-        target_node = self.graph.get_node(target_node_id)
-        self.graph.add_edge(g.Edge(source_node, target_node, time, events_count, pids, label))
+        self.graph.add_edge(source_node_id, target_node_id, time,
+                            events_count, pids, label)
 
 
 class SVGVisibleGraphLoader(AbstractGraphLoader):
     def __init__(self, graph, filename):
         AbstractGraphLoader.__init__(self, filename)
+        self.tree = ET.parse(filename)
+        self.root_el = self.tree.getroot()
         self.graph_model = graph
         self.used_edges = []
 
@@ -106,32 +113,64 @@ class SVGVisibleGraphLoader(AbstractGraphLoader):
         self.graph.translate_x = self.tr_x
         self.graph.translate_y = self.tr_y
 
-        nodes_items = graph.findall(self.ls("g[@class='node']"))
-        edges_items = graph.findall(self.ls("g[@class='edge']"))
+        # single pass over items, edges are solved after all nodes
+        g_tag = self.ls("g")
+        edges_items = []
+        for item in graph:
+            if item.tag != g_tag:
+                continue
+            item_class = item.get("class")
+            if item_class == "node":
+                self.solve_node(item)
+            elif item_class == "edge":
+                edges_items.append(item)
 
-        for node in nodes_items:
-            self.solve_node(node)
+        self.model_edges = self._create_model_edges_index()
         for edge in edges_items:
             self.solve_edge(edge)
 
         for node in self.graph.nodes.values():
             edges = node.get_edges()
-            sorted_edges = []
             if len(edges) == 0:
                 continue
-            model_edges = self.graph_model.get_node(node.get_id()).get_edges()
-
-            for model_edge in model_edges:
-                fe = [e for e in edges if e.get_time() == model_edge.get_time() and e.label == model_edge.label]
-
-                if len(fe) > 0:
-                    sorted_edges.append(fe[0])
-                    edges.remove(fe[0])
-
-            node.edges = sorted_edges
+            self.sort_edges(node)
 
         self.graph.set_root_node(self.graph_model.root.id)
 
+    def _create_model_edges_index(self):
+        # key -> (source id, target id, label), value -> first model edge
+        index = {}
+        for model_node in self.graph_model.nodes.itervalues():
+            source_id = model_node.get_id()
+            for model_edge in model_node.get_edges():
+                key = (source_id, model_edge.target.id, model_edge.label)
+                if key not in index:
+                    index[key] = model_edge
+        return index
+
+    def sort_edges(self, node):
+        """
+        Sort edges of visible node by order of edges of model node.
+        Edges are matched by time and label, edges without model edge
+        are removed.
+        """
+        edges_by_key = {}
+        for e in node.get_edges():
+            key = (e.get_time(), e.label)
+            if key in edges_by_key:
+                edges_by_key[key].append(e)
+            else:
+                edges_by_key[key] = collections.deque([e])
+
+        sorted_edges = []
+        model_edges = self.graph_model.get_node(node.get_id()).get_edges()
+        for model_edge in model_edges:
+            fe = edges_by_key.get((model_edge.get_time(), model_edge.label))
+            if fe:
+                sorted_edges.append(fe.popleft())
+
+        node.edges = sorted_edges
+
     def solve_node(self, node):
         title = node.find(self.ls("title"))
         model_node = self.graph_model.get_node(title.text)
@@ -144,7 +183,8 @@ class SVGVisibleGraphLoader(AbstractGraphLoader):
         h = polygon[2][2][1] - polygon[2][1][1]
         x += w
         w = abs(w)
-        node = g.VisibleNode(title.text, model_node.get_size(), x, y, w, h)
+        node = g.VisibleNode(title.text, model_node.get_size(), x, y, w, h,
+                             model_node.index)
         self.graph.add_node(node)
         return node
 
@@ -161,12 +201,7 @@ class SVGVisibleGraphLoader(AbstractGraphLoader):
         target_node = self.graph.get_node(title[1])
         source_node = self.graph_model.get_node(title[0])
 
-        model_edge = None
-        source_edges = source_node.get_edges()
-        for se in source_edges:
-            if se.target.id == title[1] and se.label == label[2]:
-                model_edge = se
-                break
+        model_edge = self.model_edges.get((title[0], title[1], label[2]))
         if not model_edge:
             raise Exception("Model edge not found")
 
@@ -175,7 +210,8 @@ class SVGVisibleGraphLoader(AbstractGraphLoader):
                              model_edge.get_time(),
                              model_edge.events_count,
                              model_edge.pids,
-                             label[2], label[0], label[1], path[2], polygon[2])
+                             label[2], label[0], label[1], path[2], polygon[2],
+                             model_edge.edge_id)
         self.graph.add_edge(edge)
         return edge
 
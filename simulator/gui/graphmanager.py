@@ -1,39 +1,329 @@
 import graphloader
-import paths
-import dot
-import subprocess
+import graphcache
+import layoutcache
 import os
+import weakref
+import threading
 import collections
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import exceptions as ex
 
+MEMORY_BUDGET = 1024 * 1024 * 1024 # bytes
+LAYOUT_JOBS = 2
+
+
+def _prepare_graph_file(filename):
+    """
+    Load graph from XML file and write its binary cache. Function is
+    executed in worker process and graph is not returned, manager reads
+    it from cache.
+
+    :param: filename: name of graph file
+    :type: str
+    :return: (filename, error message or None)
+    :rtype: tuple
+    """
+    try:
+        info = graphcache.load_graph_info(filename)
+    except Exception:
+        # unreadable cache is replaced by new cache
+        info = None
+    if info is not None:
+        return filename, None
+
+    try:
+        graph = graphloader.GraphLoader(filename).load()
+    except Exception:
+        return filename, "Graph in '{0}' is corrupted".format(filename)
+    try:
+        graphcache.write_graph_cache(graph, filename)
+    except (IOError, OSError):
+        # graph is loaded again by manager
+        pass
+    return filename, None
+
+
+def _create_layout(dot_source):
+    try:
+        return layoutcache.create_layout(dot_source)
+    except Exception:
+        return None
+
+
+class GraphInfo():
+    """
+    Metadata of registered graph file.
+    """
+    def __init__(self, nodes_count, edges_count):
+        self.nodes_count = nodes_count
+        self.edges_count = edges_count
+
+    def get_nodes_count(self):
+        return self.nodes_count
+
+    def get_edges_count(self):
+        return self.edges_count
+
 
 class GraphManager():
-    def __init__(self):
-        self.graphs = collections.OrderedDict()
+    """
+    Manager of graphs of project. Graph files are registered with their
+    metadata (read from header of binary cache if it is valid) and graphs
+    are loaded on first request. Loaded graphs are kept in LRU order and
+    least recently used graphs are released when their estimated size
+    exceeds memory budget. Released graph still used by simulation is
+    returned again without loading.
+
+    Layouts of visible graphs are created in background by pool of
+    'layout_jobs' threads and stored in layout cache (layoutcache).
+    Thread of pool loads graph (if it is not in memory), creates its DOT
+    source and runs 'dot' process, so main thread only submits files.
+
+    :param: use_cache: load graphs from binary cache (graphcache)\
+    and create cache after graph is loaded from XML file
+    :type: bool
+    :param: memory_budget: memory budget of loaded graphs in bytes
+    :type: int
+    :param: layout_jobs: count of layouts created at the same time
+    :type: int
+    """
+    def __init__(self, use_cache = True, memory_budget = MEMORY_BUDGET,
+                 layout_jobs = LAYOUT_JOBS):
+        self.graph_files = collections.OrderedDict() # key -> filename, value -> GraphInfo
+        self.graphs = collections.OrderedDict() # loaded graphs in LRU order
+        self.used_graphs = weakref.WeakValueDictionary()
         self.visible_graphs = {}
+        self.use_cache = use_cache
+        self.memory_budget = memory_budget
+        self.layout_jobs = layout_jobs
+        self.layout_pool = None
+        self.layout_keys = {} # key -> filename, value -> key of layout
+        self.layouts = {} # key -> filename, value -> AsyncResult
+        self.layout_callbacks = {} # callbacks of layouts in progress
+        self.layout_lock = threading.Lock()
 
     def add_graph_file(self, filename):
         try:
-            graph = self._load_graph(filename)
-            self.graphs[filename] = graph
+            info = None
+            if self.use_cache:
+                try:
+                    info = graphcache.load_graph_info(filename)
+                except (IOError, OSError):
+                    info = None
+
+            if info is None:
+                graph = self._load_graph(filename)
+                info = (graph.get_nodes_count(), graph.get_edges_count())
+                self._store_graph(filename, graph)
+            self.graph_files[filename] = GraphInfo(*info)
             self.visible_graphs[filename] = None
         except Exception:
             raise ex.GraphException("Graph in '{0}' is corrupted".format(filename))
 
+    def add_graph_files(self, filenames, callback = None, jobs = None):
+        """
+        Register more graph files. Graphs without valid cache are loaded
+        in parallel by pool of 'jobs' worker processes, which create
+        cache of graphs. Corrupted files are not registered.
+
+        :param: filenames: names of graph files
+        :type: list of str
+        :param: callback: function called with (filename, count of done\
+        files, count of files, error message or None) after each file
+        :type: Function | None
+        :param: jobs: count of worker processes (count of CPUs if None,\
+        files are loaded serially if jobs is 1 or cache is not used)
+        :type: int | None
+        :return: list of (filename, error message) of not registered files
+        :rtype: list of tuple
+        """
+        errors = []
+        count = len(filenames)
+
+        def add(filename, error, done):
+            if error is None:
+                try:
+                    self.add_graph_file(filename)
+                except ex.GraphException as e:
+                    error = e.message
+            if error is not None:
+                errors.append((filename, error))
+            if callback:
+                callback(filename, done, count, error)
+
+        if jobs is None:
+            jobs = multiprocessing.cpu_count()
+        if self.use_cache and jobs > 1 and count > 1:
+            pool = multiprocessing.Pool(min(jobs, count))
+            try:
+                results = pool.imap_unordered(_prepare_graph_file, filenames)
+                for done, (filename, error) in enumerate(results, 1):
+                    add(filename, error, done)
+                pool.close()
+            except BaseException:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+            self._sort_graph_files(filenames)
+        else:
+            for done, filename in enumerate(filenames, 1):
+                add(filename, None, done)
+        return errors
+
+    def _sort_graph_files(self, filenames):
+        # registered files are in order of 'filenames'
+        files = self.graph_files
+        added = set(filenames)
+        order = [f for f in files if f not in added]
+        order.extend(f for f in filenames if f in files)
+        self.graph_files = collections.OrderedDict((f, files[f]) for f in order)
+
     def remove_graph_file(self, filename):
+        if filename in self.graph_files:
+            del self.graph_files[filename]
         if filename in self.graphs:
             del self.graphs[filename]
+        if filename in self.used_graphs:
+            del self.used_graphs[filename]
         if filename in self.visible_graphs:
             del self.visible_graphs[filename]
+        if filename in self.layout_keys:
+            del self.layout_keys[filename]
 
     def contain_filename(self, filename):
-        return self.graphs.get(filename) != None
+        return filename in self.graph_files
 
     def get_graph_files(self):
-        return self.graphs.keys()
+        return self.graph_files.keys()
+
+    def get_graph_info(self, filename):
+        return self.graph_files.get(filename)
 
     def get_graph(self, filename):
-        return self.graphs.get(filename)
+        """
+        Returns graph of registered file. Graph is loaded
+        if it is not in memory.
+
+        :param: filename: name of graph file
+        :type: str
+        :return: graph or None if file is not registered
+        :rtype: CompactGraph | None
+        """
+        if filename not in self.graph_files:
+            return None
+        graph = self.graphs.pop(filename, None)
+        if graph is None:
+            graph = self.used_graphs.get(filename)
+        if graph is None:
+            try:
+                graph = self._load_graph(filename)
+            except Exception:
+                raise ex.GraphException("Graph in '{0}' is corrupted".format(filename))
+        self._store_graph(filename, graph)
+        return graph
+
+    def is_graph_loaded(self, filename):
+        return filename in self.graphs or filename in self.used_graphs
+
+    def get_memory_size(self):
+        """
+        Returns estimated memory size of graphs kept by manager.
+        """
+        return sum(g.get_memory_size() for g in self.graphs.values())
+
+    def _store_graph(self, filename, graph):
+        self.graphs[filename] = graph
+        self.used_graphs[filename] = graph
+        size = self.get_memory_size()
+        # most recently used graph is never released
+        while size > self.memory_budget and len(self.graphs) > 1:
+            _, released = self.graphs.popitem(last = False)
+            size -= released.get_memory_size()
+
+    def request_layout(self, filename, callback = None):
+        """
+        Start creating of layout of graph in background. Identical graphs
+        share one layout. Callback is called from thread of layout pool
+        (or immediately if layout is known), so GUI must pass it to main loop.
+
+        :param: filename: name of graph file
+        :type: str
+        :param: callback: function called with (filename, name of SVG file\
+        or None if layout was not created) when layout is ready
+        :type: Function | None
+        """
+        svg_file = self._find_svg_file(filename)
+        if svg_file is not None:
+            if callback:
+                callback(filename, svg_file)
+            return
+
+        with self.layout_lock:
+            callbacks = self.layout_callbacks.get(filename)
+            if callbacks is None:
+                # graph in memory is used, other graphs are loaded by pool
+                graph = self.graphs.get(filename)
+                if graph is None:
+                    graph = self.used_graphs.get(filename)
+                callbacks = []
+                self.layout_callbacks[filename] = callbacks
+                on_done = lambda svg_file: self._layout_done(filename, svg_file)
+                self.layouts[filename] = self._get_layout_pool().apply_async(
+                    self._prepare_layout, (filename, graph), callback = on_done)
+            if callback:
+                callbacks.append(callback)
+
+    def _layout_done(self, filename, svg_file):
+        with self.layout_lock:
+            callbacks = self.layout_callbacks.pop(filename, [])
+            self.layouts.pop(filename, None)
+        for callback in callbacks:
+            callback(filename, svg_file)
+
+    def _prepare_layout(self, filename, graph = None):
+        """
+        Returns layout of graph, layout is created if it is not in cache.
+        It is executed in thread of layout pool, graph is loaded from file
+        (without registering in manager) if it is None.
+
+        :return: name of SVG file or None if layout was not created
+        :rtype: str | None
+        """
+        try:
+            if graph is None:
+                graph = self._load_graph(filename)
+            dot_source = layoutcache.get_dot_source(graph)
+        except Exception:
+            return None
+        self.layout_keys[filename] = layoutcache.get_layout_key(dot_source)
+        return _create_layout(dot_source)
+
+    def warm_layouts(self, max_nodes_count):
+        """
+        Start creating of layouts of all graphs with at most 'max_nodes_count'
+        nodes, which are not in layout cache.
+
+        :param: max_nodes_count: max count of nodes of visible graph
+        :type: int
+        """
+        for filename, info in self.graph_files.iteritems():
+            if info.get_nodes_count() <= max_nodes_count:
+                self.request_layout(filename)
+
+    def close_layouts(self):
+        if self.layout_pool:
+            self.layout_pool.terminate()
+            self.layout_pool = None
+        with self.layout_lock:
+            self.layouts = {}
+            self.layout_callbacks = {}
+
+    def _get_layout_pool(self):
+        if self.layout_pool is None:
+            self.layout_pool = ThreadPool(self.layout_jobs)
+        return self.layout_pool
 
     def get_visual_graph(self, filename):
         vis_graph = self.visible_graphs.get(filename)
@@ -44,16 +334,45 @@ class GraphManager():
         return vis_graph
 
     def _load_graph(self, filename):
-        graph = graphloader.GraphLoader(filename).load()
+        graph = None
+        if self.use_cache:
+            try:
+                graph = graphcache.load_graph_cache(filename)
+            except (IOError, OSError):
+                graph = None
+
+        if graph is None:
+            graph = graphloader.GraphLoader(filename).load()
+            if self.use_cache:
+                try:
+                    graphcache.write_graph_cache(graph, filename)
+                except (IOError, OSError):
+                    pass
         graph.filename = filename
         return graph
 
-    def _load_visual_graph(self, graph, filename):
-        graph = self.get_graph(filename)
+    def _find_svg_file(self, filename):
+        """
+        Returns known layout of graph without loading graph. Key of layout
+        in cache is known after layout of graph was prepared.
+        """
+        # layout next to graph file has precedence over layout cache
         svg_file = filename.replace(".xml", ".svg")
+        if os.path.exists(svg_file):
+            return svg_file
+        key = self.layout_keys.get(filename)
+        if key is None:
+            return None
+        return layoutcache.get_layout(key)
 
-        if not os.path.exists(svg_file):
-            svg_file = self._create_svg_file(graph, filename)
+    def _load_visual_graph(self, graph, filename):
+        svg_file = self._find_svg_file(filename)
+        if svg_file is None:
+            result = self.layouts.get(filename)
+            if result is not None:
+                svg_file = result.get()
+            else:
+                svg_file = self._prepare_layout(filename, graph)
 
         visible_graph = None
         if svg_file:
@@ -61,16 +380,3 @@ class GraphManager():
             visible_graph.filename = filename
         return visible_graph
 
-    def _create_svg_file(self, graph, filename):
-        dot_file = filename.replace(".xml", ".dot")
-        dot_builder = dot.DotGraphBuilder(graph, dot_file)
-        dot_builder.write()
-        dot_app = paths.DOT_CMD_STRING
-        new_svg_file = filename.replace(".xml", ".svg")
-        args = dot_app + " -Tsvg " + dot_file + " -o " + new_svg_file
-        result = subprocess.call(args, shell = True)
-        if result == 0:
-            return new_svg_file
-        else:
-            return None
-
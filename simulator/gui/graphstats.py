@@ -1,68 +1,126 @@
+from array import array
 from simulator.misc import utils, colors
 
 
+class ProcessRecords():
+    """
+    Records of processes which discovered (calculated) nodes or edges.
+    First process of each item is stored in integer array (-1 if item
+    has no process), other processes (repeated work) are stored
+    in dictionary. Counts of items and repeated work of each process
+    are updated incrementally.
+
+    :param: size: count of items
+    :type: int
+    """
+    NONE = -1
+
+    def __init__(self, size):
+        self.processes = array("l", [self.NONE]) * size
+        self.more_processes = {} # key -> item id, value -> other processes
+        self.counts = {} # key -> process id, value -> count of items
+        self.repeated_counts = {} # key -> process id, value -> repeated work
+
+    def add(self, index, pid):
+        """
+        Add process to item.
+
+        :param: index: id of item
+        :type: int
+        :param: pid: id of process
+        :type: int
+        """
+        first = self.processes[index]
+        if first == self.NONE:
+            self.processes[index] = pid
+            self.counts[pid] = self.counts.get(pid, 0) + 1
+            return
+
+        self.repeated_counts[pid] = self.repeated_counts.get(pid, 0) + 1
+        others = self.more_processes.get(index)
+        if others:
+            if first != pid and pid not in others:
+                self.counts[pid] = self.counts.get(pid, 0) + 1
+            others.append(pid)
+        else:
+            if first != pid:
+                self.counts[pid] = self.counts.get(pid, 0) + 1
+            self.more_processes[index] = [pid]
+
+    def get(self, index):
+        """
+        Returns processes of item.
+
+        :param: index: id of item
+        :type: int
+        :return: ids of processes or None if item has no process
+        :rtype: list of int | None
+        """
+        pid = self.processes[index]
+        if pid == self.NONE:
+            return None
+        others = self.more_processes.get(index)
+        if others:
+            return [pid] + others
+        return [pid]
+
+    def get_count(self, pid):
+        """
+        Returns count of items of process.
+        """
+        return self.counts.get(pid, 0)
+
+    def get_repeated_count(self, pid):
+        """
+        Returns how many times process repeated work on item,
+        which already had process.
+        """
+        return self.repeated_counts.get(pid, 0)
+
+
 class GraphStats():
+    """
+    Statistics of discovered nodes and discovered and calculated edges.
+    Nodes and edges are identified by their dense ids (attributes 'index'
+    of node and 'edge_id' of edge).
+    """
+    NONE = ProcessRecords.NONE
+
     def __init__(self, graph):
         self.nodes_count = graph.get_nodes_count()
         self.edges_count = graph.get_edges_count()
-        self.undiscovered_nodes_count = self.nodes_count
-        self.undiscovered_edges_count = self.edges_count
-        self.calculated_edges_count = 0
-        self.discovered_nodes = {} # key-> node id, value -> list of discoverers
-        self.discovered_edges = {} # key-> edge id, value -> list of discoverers
-        self.calculated_edges = {} # key-> edge id, value -> list of completers
+        self.edge_ids_count = graph.get_edge_ids_count()
+        GraphStats.reset(self)
 
     def discover_node(self, node, process):
-        discoverers = self.discovered_nodes.get(node.get_id())
-        if discoverers:
-            discoverers.append(process.get_id())
-        else:
-            self.discovered_nodes[node.get_id()] = [process.get_id()]
+        self.discovered_nodes.add(node.index, process.get_id())
         self.undiscovered_nodes_count -= 1
 
     def discover_edge(self, edge, process):
-        source = edge.get_source().get_id()
-        target = edge.get_target().get_id()
-        label = edge.get_label()
-        discoverers = self.discovered_edges.get((source, target, label))
-        if discoverers:
-            discoverers.append(process.get_id())
-        else:
-            self.discovered_edges[(source, target, label)] = [process.get_id()]
+        self.discovered_edges.add(edge.edge_id, process.get_id())
         self.undiscovered_edges_count -= 1
 
     def calculate_edge(self, edge, process):
-        source = edge.get_source().get_id()
-        target = edge.get_target().get_id()
-        label = edge.get_label()
-        calculators = self.calculated_edges.get((source, target, label))
-        if calculators:
-            calculators.append(process.get_id())
-        else:
-            self.calculated_edges[(source, target, label)] = [process.get_id()]
+        self.calculated_edges.add(edge.edge_id, process.get_id())
         self.calculated_edges_count += 1
 
     def is_node_discovered(self, node):
-        return node.get_id() in self.discovered_nodes
+        return self.discovered_nodes.processes[node.index] != self.NONE
 
     def is_edge_discovered(self, edge):
-        edge_info = self._get_edge_info(edge)
-        return edge_info in self.discovered_edges
+        return self.discovered_edges.processes[edge.edge_id] != self.NONE
 
     def is_edge_calculated(self, edge):
-        edge_info = self._get_edge_info(edge)
-        return edge_info in self.calculated_edges
+        return self.calculated_edges.processes[edge.edge_id] != self.NONE
 
     def get_node_discoverer(self, node):
-        return self.discovered_nodes.get(node.get_id())
+        return self.discovered_nodes.get(node.index)
 
     def get_edge_discoverer(self, edge):
-        edge_info = self._get_edge_info(edge)
-        return self.discovered_edges.get(edge_info)
+        return self.discovered_edges.get(edge.edge_id)
 
     def get_edge_calculator(self, edge):
-        edge_info = self._get_edge_info(edge)
-        return self.calculated_edges.get(edge_info)
+        return self.calculated_edges.get(edge.edge_id)
 
     def get_nodes_count(self):
         return self.nodes_count
@@ -86,34 +144,30 @@ class GraphStats():
         return self.calculated_edges_count
 
     def get_discovered_nodes_by_process(self, process):
-        return self._count_by_process_id(process, self.discovered_nodes)
+        return self.discovered_nodes.get_count(process.get_id())
 
     def get_discovered_edges_by_process(self, process):
-        return self._count_by_process_id(process, self.discovered_edges)
+        return self.discovered_edges.get_count(process.get_id())
 
     def get_calculated_edges_by_process(self, process):
-        return self._count_by_process_id(process, self.calculated_edges)
+        return self.calculated_edges.get_count(process.get_id())
+
+    def get_repeated_discovered_nodes_by_process(self, process):
+        return self.discovered_nodes.get_repeated_count(process.get_id())
+
+    def get_repeated_discovered_edges_by_process(self, process):
+        return self.discovered_edges.get_repeated_count(process.get_id())
+
+    def get_repeated_calculated_edges_by_process(self, process):
+        return self.calculated_edges.get_repeated_count(process.get_id())
 
     def reset(self):
         self.undiscovered_nodes_count = self.nodes_count
         self.undiscovered_edges_count = self.edges_count
         self.calculated_edges_count = 0
-        self.discovered_nodes = {}
-        self.calculated_edges = {}
-        self.discovered_edges = {}
-
-    def _count_by_process_id(self, process, dictionary):
-        c = 0
-        for _, v in dictionary.iteritems():
-            if process.get_id() in v:
-                c += 1
-        return c
-
-    def _get_edge_info(self, edge):
-        source = edge.get_source().get_id()
-        target = edge.get_target().get_id()
-        label = edge.get_label()
-        return (source, target, label)
+        self.discovered_nodes = ProcessRecords(self.nodes_count)
+        self.discovered_edges = ProcessRecords(self.edge_ids_count)
+        self.calculated_edges = ProcessRecords(self.edge_ids_count)
 
 
 class VisualGraphStats(GraphStats):
@@ -146,26 +200,22 @@ class VisualGraphStats(GraphStats):
         self.selected_node = node
 
     def set_edge_visibility(self, edge, val):
-        edge_info = self._get_edge_info(edge)
         if val:
-            if not edge_info in self.visible_edges:
-                self.visible_edges[edge_info] = True
+            self.visible_edges.add(edge.edge_id)
         else:
-            if edge_info in self.visible_edges:
-                del self.visible_edges[edge_info]
+            self.visible_edges.discard(edge.edge_id)
 
     def reset(self):
         GraphStats.reset(self)
         self._set_colors()
-        self.visible_edges = {}
+        self.visible_edges = set() # ids of visible edges
         self.selected_node = None
 
     def is_node_visible(self, node):
         return self.is_node_discovered(node)
 
     def is_edge_visible(self, edge):
-        edge_info = self._get_edge_info(edge)
-        return edge_info in self.visible_edges
+        return edge.edge_id in self.visible_edges
 
     def is_selected_node(self, node):
         return self.selected_node and self.selected_node == node
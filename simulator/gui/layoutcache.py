@@ -0,0 +1,86 @@
+"""
+Content-addressed cache of graph layouts. Layout (SVG file created
+by graphviz 'dot') is stored in layout directory under hash of DOT source
+of graph, so identical graphs from different files share one layout.
+"""
+import os
+import hashlib
+import tempfile
+import subprocess
+import paths
+import dot
+
+SUFFIX = ".svg"
+
+
+def get_dot_source(graph):
+    return dot.DotGraphBuilder(graph, None).build()
+
+
+def get_layout_key(dot_source):
+    return hashlib.sha1(dot_source).hexdigest()
+
+
+def get_layout_filename(key):
+    return os.path.join(paths.LAYOUT_CACHE_DIRECTORY, key + SUFFIX)
+
+
+def get_layout(key):
+    """
+    Returns cached layout.
+
+    :param: key: key of layout (see get_layout_key)
+    :type: str
+    :return: name of SVG file or None if layout is not in cache
+    :rtype: str | None
+    """
+    layout_file = get_layout_filename(key)
+    if os.path.exists(layout_file):
+        return layout_file
+    return None
+
+
+def create_layout(dot_source):
+    """
+    Returns layout of graph, layout is created by 'dot' if it is not
+    in cache. New layout is written to temporary file, which is renamed
+    after 'dot' finishes, so cache never contains incomplete layout.
+
+    :param: dot_source: DOT source of graph (see get_dot_source)
+    :type: str
+    :return: name of SVG file or None if 'dot' failed
+    :rtype: str | None
+    """
+    layout_file = get_layout_filename(get_layout_key(dot_source))
+    if os.path.exists(layout_file):
+        return layout_file
+
+    directory = os.path.dirname(layout_file)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                return None
+
+    fd, tmp_file = tempfile.mkstemp(".tmp", dir = directory)
+    os.close(fd)
+    args = [paths.DOT_PATH, "-Tsvg", "-o", tmp_file]
+    try:
+        dot_process = subprocess.Popen(args, stdin = subprocess.PIPE)
+        dot_process.communicate(dot_source)
+    except OSError:
+        os.remove(tmp_file)
+        return None
+
+    if dot_process.returncode != 0:
+        os.remove(tmp_file)
+        return None
+    try:
+        os.rename(tmp_file, layout_file)
+    except OSError:
+        # same layout was created by another worker
+        os.remove(tmp_file)
+        if not os.path.exists(layout_file):
+            return None
+    return layout_file
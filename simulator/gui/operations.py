@@ -30,6 +30,10 @@ class GenerateGraph(Operation):
         seed_spin = builder.get_object("seed_spin")
         file_chooser_button = builder.get_object("file_chooser_button")
         insert_checkbutton = builder.get_object("insert_checkbutton")
+        topology_combobox = builder.get_object("topology_combobox")
+        for topology in graphgenerator.TOPOLOGIES:
+            topology_combobox.append_text(topology)
+        topology_combobox.set_active(0)
         properties = {}
 
         def on_file_button_clicked(w):
@@ -42,6 +46,7 @@ class GenerateGraph(Operation):
         try:
             response = gen_dialog.run()
             if response == 1:
+                properties["topology"] = topology_combobox.get_active_text()
                 try:
                     graph_generator = graphgenerator.GraphGenerator(filename_entry.get_text(),
                                                      nodes_count_spin.get_value_as_int(),
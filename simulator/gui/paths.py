@@ -8,12 +8,15 @@ RESOURCES = os.path.join(SRC_PATH, "resources")
 CONFIG_FILE_PATH = ROOT
 ICONS_PATH = os.path.join(RESOURCES, "icons", "")
 GLADE_DIALOG_DIRECTORY = os.path.join(RESOURCES, "glade_dialogs", "")
+LAYOUT_CACHE_DIRECTORY = os.path.join(CONFIG_FILE_PATH, ".layouts", "")
 
 if sys.platform == "win32":
     DOT_DIRECTORY = "C:\\Program Files (x86)\\Graphviz2.38\\bin\\"
     DOT_PROGRAM = "dot.exe"
     DOT_CMD_STRING = "\"" + DOT_DIRECTORY + DOT_PROGRAM + "\""
+    DOT_PATH = DOT_DIRECTORY + DOT_PROGRAM
 elif sys.platform == "linux2":
     DOT_DIRECTORY = ""
     DOT_PROGRAM = "dot"
-    DOT_CMD_STRING = DOT_PROGRAM 
\ No newline at end of file
+    DOT_CMD_STRING = DOT_PROGRAM
+    DOT_PATH = DOT_PROGRAM 
\ No newline at end of file
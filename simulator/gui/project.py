@@ -33,7 +33,7 @@ class Project():
     def is_saved(self):
         return self.saved
 
-    def add_file(self, filename):
+    def _check_file(self, filename):
         if self.graph_manager.contain_filename(filename):
             raise exc.GraphException("'{0}' is already in project".format(filename))
         if not filename.endswith(".xml"):
@@ -41,12 +41,55 @@ class Project():
         if not os.path.exists(filename):
             raise exc.GraphException ("'{0}' not exists".format(filename))
 
+    def add_file(self, filename):
+        self._check_file(filename)
+
         try:
             self.graph_manager.add_graph_file(filename)
             self.saved = False
         except exc.GraphException as ex:
             raise ex
 
+    def add_files(self, filenames, callback = None, jobs = None):
+        """
+        Add more graph files to project. Graphs are loaded in parallel
+        (see GraphManager.add_graph_files), invalid and corrupted files
+        are skipped.
+
+        :param: filenames: names of graph files
+        :type: list of str
+        :param: callback: function called with (filename, count of done\
+        files, count of files, error message or None) after each file
+        :type: Function | None
+        :param: jobs: count of worker processes
+        :type: int | None
+        :return: list of (filename, error message) of skipped files
+        :rtype: list of tuple
+        """
+        errors = []
+        valid_files = []
+        for filename in filenames:
+            try:
+                if filename in valid_files:
+                    raise exc.GraphException("'{0}' is already in project".format(filename))
+                self._check_file(filename)
+                valid_files.append(filename)
+            except exc.GraphException as ex:
+                errors.append((filename, ex.message))
+                if callback:
+                    callback(filename, len(errors), len(filenames), ex.message)
+
+        def on_file(filename, done, count, error):
+            if callback:
+                callback(filename, len(errors) + done, len(filenames), error)
+
+        errors.extend(self.graph_manager.add_graph_files(valid_files,
+                                                         on_file,
+                                                         jobs))
+        if len(errors) < len(filenames):
+            self.saved = False
+        return errors
+
     def remove_file(self, filename):
         self.saved = False
         self.graph_manager.remove_graph_file(filename)
@@ -57,4 +100,5 @@ class Project():
     def close(self):
         for t in reversed(self.opened_tabs):
             t.close()
+        self.graph_manager.close_layouts()
 
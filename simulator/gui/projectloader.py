@@ -13,7 +13,22 @@ class ProjectLoader():
         return project
 
     @staticmethod
-    def load_project(filename):
+    def load_project(filename, callback = None, jobs = None):
+        """
+        Load project. Graph files are loaded in parallel by 'jobs' worker
+        processes, corrupted graph files are skipped and reported
+        by 'callback'.
+
+        :param: filename: name of project file
+        :type: str
+        :param: callback: function called with (filename, count of done\
+        files, count of files, error message or None) after each graph file
+        :type: Function | None
+        :param: jobs: count of worker processes (count of CPUs if None)
+        :type: int | None
+        :return: project
+        :rtype: Project
+        """
         if not os.path.exists(filename):
             raise Exception("File '{0}' not exists".format(filename))
 
@@ -32,12 +47,14 @@ class ProjectLoader():
 
         project = Project(filename, project_name)
 
+        files = []
         for file_el in files_nodes:
             file_path = file_el.get("path")
             if not file_path:
                 raise Exception("Some file in project has unspecified 'path' attribute")
-            project.add_file(file_path)
+            files.append(file_path)
 
+        project.add_files(files, callback, jobs)
         return project
 
     @staticmethod
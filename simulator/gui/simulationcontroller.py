@@ -192,9 +192,11 @@ class SimulationController():
             nodes_discovered = gs.get_discovered_nodes_by_process(p)
             edges_discovered = gs.get_discovered_edges_by_process(p)
             edges_calculated = gs.get_calculated_edges_by_process(p)
+            edges_recalculated = gs.get_repeated_calculated_edges_by_process(p)
             stats.update_prop(attr.format("discovered_nodes"), nodes_discovered)
             stats.update_prop(attr.format("discovered_edges"), edges_discovered)
             stats.update_prop(attr.format("calculated_edges"), edges_calculated)
+            stats.update_prop(attr.format("recalculated_edges"), edges_recalculated)
 
     def on_simulation_start(self, simulation):
         def log(message, msg_type):
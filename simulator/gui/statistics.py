@@ -223,6 +223,7 @@ class SimulationStatistics(Statistics):
             nodes_discovered = gs.get_discovered_nodes_by_process(pr)
             edges_discovered = gs.get_discovered_edges_by_process(pr)
             edges_calculated = gs.get_calculated_edges_by_process(pr)
+            edges_recalculated = gs.get_repeated_calculated_edges_by_process(pr)
 
             i = self.add_prop(Property(pi,
                                        "Process",
@@ -276,3 +277,9 @@ class SimulationStatistics(Statistics):
                                    "Count of calculated edges by process",
                                    attr.format("calculated_edges")))
 
+            self.add_prop(Property(i,
+                                   "Edges recalculated",
+                                   edges_recalculated,
+                                   "Count of calculations of edges by process, which were already calculated",
+                                   attr.format("recalculated_edges")))
+
@@ -1,4 +1,5 @@
 import gtk
+import gobject
 import sys
 import paths
 import ntpath
@@ -265,10 +266,10 @@ class ProjectTab(Tab):
 
     def add_graph(self, filename):
         graph_manager = self.project.graph_manager
-        graph = graph_manager.get_graph(filename)
-        if graph:
-            nodes = graph.get_nodes_count()
-            edges = graph.get_edges_count()
+        info = graph_manager.get_graph_info(filename)
+        if info:
+            nodes = info.get_nodes_count()
+            edges = info.get_edges_count()
             self.liststore.append([False, filename, nodes, edges])
             info = "Graph '{0}' added to project"
             self.win.console.writeln(info.format(filename))
@@ -399,10 +400,38 @@ class ProjectTab(Tab):
                               network_model,
                               process_model,
                               arguments = None):
+        def on_layout(filename, svg_file):
+            gobject.idle_add(self._run_visual_simulation, filename, svg_file,
+                             process_type, process_count, network_model,
+                             process_model, arguments)
+
+        # layout is created in background
+        try:
+            self.project.graph_manager.request_layout(filename, on_layout)
+        except exc.GraphException as ex:
+            self.win.console.writeln(ex.message, "err")
+
+    def _run_visual_simulation(self,
+                               filename,
+                               svg_file,
+                               process_type,
+                               process_count,
+                               network_model,
+                               process_model,
+                               arguments = None):
         CANVAS_MAX_SIZE = 5000
+        if svg_file is None:
+            err_text = "Graph {0} was skipped because its layout" + \
+                       " was not created"
+            self.win.console.writeln(err_text.format(filename), "err")
+            return
         name = ntpath.basename(filename)
         title = "{0} - {1}({2})".format(name, process_type, process_count)
-        graph = self.project.graph_manager.get_visual_graph(filename)
+        try:
+            graph = self.project.graph_manager.get_visual_graph(filename)
+        except Exception as ex:
+            self.win.console.writeln(ex.message, "err")
+            return
         if graph.width > CANVAS_MAX_SIZE or graph.height > CANVAS_MAX_SIZE:
             err_text = "Graph {0} was skipped because is too big" + \
                        " for drawing on canvas"
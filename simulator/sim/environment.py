@@ -0,0 +1,58 @@
+"""
+Environments available for simulations.
+
+Environment has to provide interface of Simpy environment used by processes
+('now', 'event', 'timeout', 'process', 'step', 'run'), method
+'get_events_count' which returns count of scheduled events and method
+'call_later' which calls function after delay (ordered as timeout).
+"""
+import collections
+import copy
+import simpy
+import kernel
+
+
+class SimpyEnvironment(simpy.Environment):
+    """
+    Simpy environment.
+    """
+    NAME = "simpy"
+
+    def get_events_count(self):
+        # ids of events are taken from counter, copy is not advanced
+        return next(copy.copy(self._eid))
+
+    def call_later(self, delay, callback):
+        self.timeout(delay).callbacks.append(lambda event: callback())
+
+
+DEFAULT_ENVIRONMENT = SimpyEnvironment.NAME
+
+environments = collections.OrderedDict()
+environments[SimpyEnvironment.NAME] = SimpyEnvironment
+environments[kernel.Environment.NAME] = kernel.Environment
+
+
+def get_environments():
+    """
+    Returns names of available environments.
+
+    :return: names of environments
+    :rtype: list of str
+    """
+    return environments.keys()
+
+
+def create_environment(name = None):
+    """
+    Create new environment.
+
+    :param: name: name of environment (default environment if None)
+    :type: str | None
+    :return: new environment
+    :rtype: Environment
+    """
+    env_class = environments.get(name or DEFAULT_ENVIRONMENT)
+    if env_class is None:
+        raise Exception("Unknown environment '{0}'".format(name))
+    return env_class()
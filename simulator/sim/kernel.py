@@ -0,0 +1,267 @@
+"""
+Discrete event kernel specialised for simulations of this simulator.
+
+Kernel implements only subset of Simpy used by processes (events, timeouts
+and processes) with same ordering of events, so simulations produce
+identical results. Events are slotted objects and scheduled events
+are stored in binary heap of (time, key, event) records, where key combines
+priority and sequence number of event.
+
+Timeouts which only wake up code of simulator (completion of edge, delivery
+of message, window of batch) are not events. They are scheduled by
+'call_later' as compact (time, key, None, callback) records, which are
+ordered as Simpy timeouts.
+"""
+from heapq import heappush, heappop
+from simpy.core import EmptySchedule, StopSimulation
+
+URGENT = 0
+NORMAL = 1
+
+# key of scheduled event is 'priority * _PRIORITY_STEP + sequence number'
+_PRIORITY_STEP = 1 << 62
+
+PENDING = object()
+
+
+class Event(object):
+    """
+    Event which may happen at some point in time. Event is scheduled
+    when it is triggered by 'succeed' or 'fail' and all callbacks are
+    called with event when event is processed.
+
+    :param: env: environment
+    :type: Environment
+    """
+    __slots__ = ("env", "callbacks", "_value", "_ok", "_defused")
+
+    def __init__(self, env):
+        self.env = env
+        self.callbacks = []
+        self._value = PENDING
+        self._defused = False
+
+    @property
+    def triggered(self):
+        return self._value is not PENDING
+
+    @property
+    def processed(self):
+        return self.callbacks is None
+
+    @property
+    def ok(self):
+        return self._ok
+
+    @property
+    def value(self):
+        if self._value is PENDING:
+            raise AttributeError("Value of event is not yet available")
+        return self._value
+
+    def succeed(self, value = None):
+        if self._value is not PENDING:
+            raise RuntimeError("Event has already been triggered")
+        self._ok = True
+        self._value = value
+        self.env.schedule(self)
+        return self
+
+    def fail(self, exception):
+        if self._value is not PENDING:
+            raise RuntimeError("Event has already been triggered")
+        if not isinstance(exception, BaseException):
+            raise ValueError("{0} is not an exception".format(exception))
+        self._ok = False
+        self._value = exception
+        self.env.schedule(self)
+        return self
+
+
+class Timeout(Event):
+    """
+    Event triggered after 'delay' time.
+    """
+    __slots__ = ()
+
+    def __init__(self, env, delay, value = None):
+        if delay < 0:
+            raise ValueError("Negative delay {0}".format(delay))
+        self.env = env
+        self.callbacks = []
+        self._value = value
+        self._ok = True
+        self._defused = False
+        env.schedule(self, NORMAL, delay)
+
+
+class Process(Event):
+    """
+    Process driven by generator yielding events. Process is event
+    too, which is triggered when generator ends.
+
+    :param: env: environment
+    :type: Environment
+    :param: generator: generator yielding events
+    :type: generator
+    """
+    __slots__ = ("_generator", "_target")
+
+    def __init__(self, env, generator):
+        if not hasattr(generator, "throw"):
+            raise ValueError("{0} is not a generator".format(generator))
+        self.env = env
+        self.callbacks = []
+        self._value = PENDING
+        self._defused = False
+        self._generator = generator
+        init = Event(env)
+        init.callbacks.append(self._resume)
+        init._ok = True
+        init._value = None
+        env.schedule(init, URGENT)
+        self._target = init
+
+    @property
+    def is_alive(self):
+        return self._value is PENDING
+
+    def _resume(self, event):
+        env = self.env
+        env._active_proc = self
+        while True:
+            try:
+                if event._ok:
+                    event = self._generator.send(event._value)
+                else:
+                    event._defused = True
+                    exc = type(event._value)(*event._value.args)
+                    exc.__cause__ = event._value
+                    event = self._generator.throw(exc)
+            except StopIteration as e:
+                event = None
+                self._ok = True
+                self._value = e.args[0] if len(e.args) else None
+                env.schedule(self)
+                break
+            except BaseException as e:
+                event = None
+                self._ok = False
+                self._value = e
+                env.schedule(self)
+                break
+
+            try:
+                if event.callbacks is not None:
+                    event.callbacks.append(self._resume)
+                    break
+            except AttributeError:
+                raise RuntimeError("Invalid yield value '{0}'".format(event))
+
+        self._target = event
+        env._active_proc = None
+
+
+class Environment(object):
+    """
+    Execution environment of simulation. Time is simulated by stepping
+    from one scheduled event to another.
+
+    :param: initial_time: start time of simulation
+    :type: float
+    """
+    NAME = "kernel"
+
+    def __init__(self, initial_time = 0):
+        self._now = initial_time
+        self._queue = []
+        self._eid = 0
+        self._active_proc = None
+
+    @property
+    def now(self):
+        return self._now
+
+    @property
+    def active_process(self):
+        return self._active_proc
+
+    def event(self):
+        return Event(self)
+
+    def timeout(self, delay, value = None):
+        return Timeout(self, delay, value)
+
+    def process(self, generator):
+        return Process(self, generator)
+
+    def get_events_count(self):
+        return self._eid
+
+    def call_later(self, delay, callback):
+        """
+        Call 'callback' (without arguments) after 'delay' time. No event
+        is created, call is ordered as timeout with same delay.
+
+        :param: delay: delay of call
+        :type: float
+        :param: callback: function
+        :type: Function
+        """
+        if delay < 0:
+            raise ValueError("Negative delay {0}".format(delay))
+        self._eid += 1
+        heappush(self._queue, (self._now + delay,
+                               NORMAL * _PRIORITY_STEP + self._eid,
+                               None,
+                               callback))
+
+    def schedule(self, event, priority = NORMAL, delay = 0):
+        self._eid += 1
+        heappush(self._queue, (self._now + delay,
+                               priority * _PRIORITY_STEP + self._eid,
+                               event))
+
+    def peek(self):
+        if self._queue:
+            return self._queue[0][0]
+        return float("inf")
+
+    def step(self):
+        """
+        Process next scheduled event.
+
+        :raise EmptySchedule: if there is no scheduled event
+        """
+        try:
+            record = heappop(self._queue)
+        except IndexError:
+            raise EmptySchedule()
+
+        self._now = record[0]
+        event = record[2]
+        if event is None:
+            # record of 'call_later'
+            record[3]()
+            return
+        callbacks, event.callbacks = event.callbacks, None
+        for callback in callbacks:
+            callback(event)
+
+        if not event._ok and not event._defused:
+            exc = type(event._value)(*event._value.args)
+            exc.__cause__ = event._value
+            raise exc
+
+    def run(self):
+        """
+        Process events until there is no scheduled event or simulation
+        is stopped.
+        """
+        try:
+            while True:
+                self.step()
+        except StopSimulation as exc:
+            return exc.args[0]
+        except EmptySchedule:
+            pass
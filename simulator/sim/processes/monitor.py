@@ -1,19 +1,141 @@
 import re
+from array import array
+from bisect import bisect_right
+from itertools import izip, imap
 from simulator.gui.events import EventSource
+from simulator.sim.processes.trace import TraceFile, StringTable
+
+
+class MonitorProfile():
+    """
+    Profile defines which monitors are created in simulation.
+    Monitors required by enabled monitors are enabled too.
+
+    :param: name: name of profile
+    :type: str
+    :param: monitors: names of enabled monitors
+    :type: list of str
+    """
+    MONITORS = ["GlobalTimeMonitor",
+                "GlobalMemoryMonitor",
+                "GlobalStorageMonitor",
+                "ProcessMonitor",
+                "ClockMonitor",
+                "CommunicationMonitor",
+                "MemoryMonitor",
+                "EdgeMonitor",
+                "StorageMonitor"]
+
+    DEPENDENCIES = {"GlobalMemoryMonitor": ["GlobalTimeMonitor"],
+                    "MemoryMonitor": ["GlobalTimeMonitor"],
+                    "EdgeMonitor": ["GlobalTimeMonitor"]}
+
+    def __init__(self, name, monitors):
+        self.name = name
+        self.monitors = set()
+        for m in monitors:
+            if m not in self.MONITORS:
+                raise Exception("Unknown monitor '{0}'".format(m))
+            self.monitors.add(m)
+            self.monitors.update(self.DEPENDENCIES.get(m, []))
+
+    def get_name(self):
+        return self.name
+
+    def is_enabled(self, monitor_name):
+        return monitor_name in self.monitors
+
+
+profiles = {
+    "none": MonitorProfile("none", []),
+    "summary": MonitorProfile("summary", ["GlobalMemoryMonitor"]),
+    "full": MonitorProfile("full", MonitorProfile.MONITORS)
+}
+
+DEFAULT_PROFILE = "full"
+
+
+def get_monitor_profile(profile = None):
+    """
+    Returns monitor profile. Profile can be name of profile
+    ("none", "summary", "full"), list of monitors names (custom profile)
+    or MonitorProfile. Default profile is returned if profile is None.
+
+    :param: profile: profile
+    :type: str | list of str | MonitorProfile | None
+    :return: monitor profile
+    :rtype: MonitorProfile
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, MonitorProfile):
+        return profile
+    if isinstance(profile, basestring):
+        p = profiles.get(profile)
+        if p is None:
+            raise Exception("Unknown monitor profile '{0}'".format(profile))
+        return p
+    return MonitorProfile("custom", profile)
 
 
 class MonitorManager():
     """
     Monitor manager responsible for all monitors
     which are in simulation.
+
+    :param: profile: monitor profile (see get_monitor_profile)
+    :type: str | list of str | MonitorProfile | None
     """
     REGEX = "(^p)(\d+)(_)(\w+)"
 
-    def __init__(self):
+    def __init__(self, profile = None):
         self.monitors = {}
         self.listeners = {}
         self.process_listeners = {}
         self.global_monitors = {}
+        self.profile = get_monitor_profile(profile)
+        self.trace = None
+        self.strings = StringTable("i") # strings of all monitors
+
+    def get_profile(self):
+        return self.profile
+
+    def get_trace(self):
+        return self.trace
+
+    def set_trace(self, trace):
+        """
+        Set trace file to which monitors registered later store
+        measured values. Trace is not used if 'trace' is None.
+
+        :param: trace: trace file
+        :type: TraceFile | None
+        """
+        self.trace = trace
+
+    def close_trace(self):
+        """
+        Flush measured values to trace file and close it.
+        Values can be still read from closed trace file.
+        """
+        if self.trace:
+            self.flush()
+            self.trace.close()
+
+    def flush(self):
+        """
+        Flush buffered measured values of all monitors.
+        """
+        for m in self.global_monitors.values():
+            m.flush()
+        for pr_monitors in self.monitors.values():
+            for m in pr_monitors:
+                m.flush()
+        if self.trace:
+            self.trace.flush()
+
+    def is_enabled(self, monitor_name):
+        return self.profile.is_enabled(monitor_name)
 
     def add_callback(self, event_name, object):
         if event_name in self.listeners:
@@ -79,8 +201,25 @@ class MonitorManager():
         m = self.global_monitors.get(monitor.get_id())
         if m:
             raise Exception("Cant register more same global monitors")
+        if self.trace:
+            monitor.set_trace(self.trace, monitor.get_id())
+        else:
+            monitor.set_strings(self.strings)
         self.global_monitors[monitor.get_id()] = monitor
 
+    def add_process_monitor(self, process, monitor_class):
+        """
+        Create and register monitor of given class to process
+        if monitor is enabled in profile.
+
+        :param: process: process
+        :type: Process
+        :param: monitor_class: class of monitor
+        :type: class
+        """
+        if self.profile.is_enabled(monitor_class.__name__):
+            self.register_process_monitor(process.id, monitor_class(process))
+
     def register_process_monitor(self, pid, monitor):
         """
         Register monitor to specific process.
@@ -90,6 +229,10 @@ class MonitorManager():
         :param: monitor: monitor for process
         :type: Monitor
         """
+        if self.trace:
+            monitor.set_trace(self.trace, "p{0}_{1}".format(pid, monitor.get_id()))
+        else:
+            monitor.set_strings(self.strings)
         if pid not in self.monitors:
             self.monitors[pid] = [monitor]
         else:
@@ -112,6 +255,7 @@ class MonitorManager():
     def clear_monitors(self):
         self.monitors = {}
         self.global_monitors = {}
+        self.strings = StringTable("i")
 
     def get_monitor(self, monitor_id):
         return self.global_monitors.get(monitor_id)
@@ -132,6 +276,22 @@ class MonitorManager():
             for m in pr_monitors:
                 m.clear()
 
+    def get_memory_size(self):
+        """
+        Returns estimated memory size of measured values kept
+        by monitors in bytes.
+
+        :return: memory size
+        :rtype: int
+        """
+        size = self.strings.get_memory_size()
+        for m in self.global_monitors.values():
+            size += m.get_memory_size()
+        for pr_monitors in self.monitors.values():
+            for m in pr_monitors:
+                size += m.get_memory_size()
+        return size
+
 
 class Entry():
     """
@@ -145,6 +305,344 @@ class Entry():
         return len(val) == len(self.args)
 
 
+class Column():
+    """
+    Typed column of values of one entry argument. Type of column is
+    chosen by first value. Numbers are stored in arrays (integer column
+    is changed to float column when float value is stored). Strings
+    (and None) are interned to table of strings and stored as array
+    of indexes to table (see StringTable). Other values (or strings
+    mixed with other values) are stored as references in list.
+
+    :param: name: name of entry argument
+    :type: str
+    :param: strings: table of strings shared by columns (column has own\
+    table if it is None)
+    :type: StringTable | None
+    """
+    def __init__(self, name, strings = None):
+        self.name = name
+        self.strings = strings
+        self.data = None
+        self.table = None
+
+    def _create_data(self, value):
+        if isinstance(value, bool):
+            return []
+        if isinstance(value, (int, long)):
+            return array("l")
+        if isinstance(value, float):
+            return array("d")
+        if value is None or isinstance(value, basestring):
+            self.table = self.strings
+            if self.table is None:
+                self.table = StringTable()
+            return array(self.table.typecode)
+        return []
+
+    def extend(self, values):
+        """
+        Append values to column. Type of column is changed when values
+        can't be stored in current type.
+
+        :param: values: new values
+        :type: sequence
+        """
+        if self.data is None:
+            self.data = self._create_data(values[0])
+        data = self.data
+        if self.table is not None:
+            try:
+                data.extend(self.table.encode(values))
+                return
+            except TypeError:
+                data = self.table.decode(data)
+                self.table = None
+                data.extend(values)
+                self.data = data
+                return
+        n = len(data)
+        try:
+            data.extend(values)
+            return
+        except (TypeError, OverflowError):
+            del data[n:]
+
+        if data.typecode == "l":
+            data = array("d", data)
+            try:
+                data.extend(values)
+                self.data = data
+                return
+            except (TypeError, OverflowError):
+                del data[n:]
+        data = list(data)
+        data.extend(values)
+        self.data = data
+
+    def __len__(self):
+        if self.data is None:
+            return 0
+        return len(self.data)
+
+    def __getitem__(self, i):
+        if self.data is None:
+            raise IndexError("column index out of range")
+        if self.table is not None:
+            return self.table.get(self.data[i])
+        return self.data[i]
+
+    def __iter__(self):
+        if self.data is None:
+            return iter(())
+        if self.table is not None:
+            return imap(self.table.get, self.data)
+        return iter(self.data)
+
+    def get_memory_size(self):
+        """
+        Returns estimated memory size of column in bytes (values
+        in list are shared, so only references are counted).
+        """
+        if self.data is None:
+            return 0
+        if isinstance(self.data, array):
+            size = self.data.itemsize * len(self.data)
+            # shared table is counted by its owner
+            if self.table is not None and self.table is not self.strings:
+                size += self.table.get_memory_size()
+            return size
+        return 8 * len(self.data)
+
+    def get_values(self):
+        """
+        Returns stored values. Numeric columns are returned as arrays
+        without copy (they can be used by numpy.frombuffer), string
+        columns are decoded to list.
+
+        :return: values of column
+        :rtype: array | list
+        """
+        if self.data is None:
+            return []
+        if self.table is not None:
+            return self.table.decode(self.data)
+        return self.data
+
+    def clear(self):
+        self.data = None
+        self.table = None
+
+
+class EntryData():
+    """
+    Measured values of entry stored in columns (one column for
+    each entry argument). New values are buffered and moved to columns
+    in chunks of CHUNK_SIZE values. Data behaves like sequence of tuples.
+
+    :param: entry: entry
+    :type: Entry
+    :param: strings: table of strings shared by columns
+    :type: StringTable | None
+    """
+    CHUNK_SIZE = 512
+
+    def __init__(self, entry, strings = None):
+        self.entry = entry
+        self.columns = [Column(arg, strings) for arg in entry.args]
+        self.width = len(self.columns)
+        self.size = 0
+        self.buffer = []
+
+    def append(self, val):
+        if len(val) != self.width:
+            raise Exception("Invalid arguments for entry '" + self.entry.entry_name + "'")
+        buffer = self.buffer
+        buffer.append(val)
+        if len(buffer) >= self.CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+        Move buffered values to columns.
+        """
+        rows = self.buffer
+        if not rows:
+            return
+        self.buffer = []
+        for column, values in izip(self.columns, izip(*rows)):
+            column.extend(values)
+        self.size += len(rows)
+
+    def get_column(self, name):
+        """
+        Returns column of given entry argument.
+
+        :param: name: name of entry argument
+        :type: str
+        :return: column
+        :rtype: Column
+        """
+        self.flush()
+        for c in self.columns:
+            if c.name == name:
+                return c
+        raise Exception("Unknown column '{0}'".format(name))
+
+    def get_columns(self):
+        self.flush()
+        return self.columns
+
+    def get_memory_size(self):
+        """
+        Returns estimated memory size of columns and buffered values
+        in bytes.
+        """
+        # buffered value is tuple with references
+        size = len(self.buffer) * (56 + 8 * self.width)
+        for c in self.columns:
+            size += c.get_memory_size()
+        return size
+
+    def __len__(self):
+        return self.size + len(self.buffer)
+
+    def __getitem__(self, i):
+        self.flush()
+        if i < 0:
+            i += self.size
+        if i < 0 or i >= self.size:
+            raise IndexError("entry data index out of range")
+        return tuple(c[i] for c in self.columns)
+
+    def __iter__(self):
+        self.flush()
+        if self.size == 0:
+            return iter(())
+        return izip(*self.columns)
+
+    def clear(self):
+        for c in self.columns:
+            c.clear()
+        self.size = 0
+        self.buffer = []
+
+
+class TraceEntryData(EntryData):
+    """
+    Measured values of entry stored in trace file. Chunks of values are
+    written to file during simulation, so only buffered values are kept
+    in memory. Values are read back lazily by chunks.
+
+    :param: entry: entry
+    :type: Entry
+    :param: trace: trace file
+    :type: TraceFile
+    :param: name: name of stream in trace file
+    :type: str
+    :param: stream: id of existing stream in trace file, new stream\
+    is created if it is None
+    :type: int | None
+    """
+    def __init__(self, entry, trace, name, stream = None):
+        EntryData.__init__(self, entry)
+        self.trace = trace
+        self.name = name
+        self.chunk_starts = []
+        if stream is None:
+            self.stream = trace.add_stream(name, entry.args)
+        else:
+            self.stream = stream
+            for _, count, _ in trace.get_chunks(stream):
+                self.chunk_starts.append(self.size)
+                self.size += count
+        self.cached_chunk = None
+        self.cached_columns = None
+
+    def flush(self):
+        """
+        Write buffered values to trace file.
+        """
+        rows = self.buffer
+        if not rows:
+            return
+        self.buffer = []
+        self.trace.write_chunk(self.stream, rows)
+        self.chunk_starts.append(self.size)
+        self.size += len(rows)
+
+    def _read_chunk(self, chunk_index):
+        if self.cached_chunk != chunk_index:
+            self.cached_columns = self.trace.read_chunk(self.stream, chunk_index)
+            self.cached_chunk = chunk_index
+        return self.cached_columns
+
+    def get_columns(self):
+        """
+        Returns columns with all values read from trace file.
+
+        :return: columns
+        :rtype: list of Column
+        """
+        self.flush()
+        columns = [Column(arg) for arg in self.entry.args]
+        for chunk_index in xrange(len(self.chunk_starts)):
+            for column, values in izip(columns, self._read_chunk(chunk_index)):
+                column.extend(values)
+        return columns
+
+    def get_column(self, name):
+        for c in self.get_columns():
+            if c.name == name:
+                return c
+        raise Exception("Unknown column '{0}'".format(name))
+
+    def __getitem__(self, i):
+        self.flush()
+        if i < 0:
+            i += self.size
+        if i < 0 or i >= self.size:
+            raise IndexError("entry data index out of range")
+        chunk_index = bisect_right(self.chunk_starts, i) - 1
+        i -= self.chunk_starts[chunk_index]
+        return tuple(c[i] for c in self._read_chunk(chunk_index))
+
+    def __iter__(self):
+        self.flush()
+        for chunk_index in xrange(len(self.chunk_starts)):
+            for row in izip(*self.trace.read_chunk(self.stream, chunk_index)):
+                yield row
+
+    def clear(self):
+        # written values can't be removed from file, so new stream is used
+        self.stream = self.trace.add_stream(self.name, self.entry.args)
+        self.chunk_starts = []
+        self.cached_chunk = None
+        self.cached_columns = None
+        self.size = 0
+        self.buffer = []
+
+
+def load_trace(filename):
+    """
+    Load measured values from trace file written by simulation.
+    Values are read lazily.
+
+    :param: filename: name of trace file
+    :type: str
+    :return: measured values by stream names ('monitor/entry'\
+    for global monitors and 'p<pid>_monitor/entry' for process monitors)
+    :rtype: dict
+    """
+    trace = TraceFile(filename, "r")
+    data = {}
+    for stream, (name, args) in enumerate(trace.get_streams()):
+        entry = Entry(name.rsplit("/", 1)[-1], args)
+        # cleared entries have more streams with same name, last one is used
+        data[name] = TraceEntryData(entry, trace, name, stream)
+    return data
+
+
 class MonitorBase(EventSource):
     """
     Class for global monitor.
@@ -163,15 +661,17 @@ class MonitorBase(EventSource):
         return self.id
 
     def put(self, entry_name, val):
-        if entry_name in self.entries:
-            entry = self.entries[entry_name]
-            if entry.check(val):
-                self.data[entry_name].append(val)
-                self.fire("entry_put", val)
-            else:
-                raise Exception("Invalid arguments for entry '" + entry_name + "'")
-        else:
+        data = self.data.get(entry_name)
+        if data is None:
             raise Exception("Unknown entry name")
+        if len(val) != data.width:
+            raise Exception("Invalid arguments for entry '" + entry_name + "'")
+        # inlined EntryData.append
+        buffer = data.buffer
+        buffer.append(val)
+        if len(buffer) >= data.CHUNK_SIZE:
+            data.flush()
+        self.fire("entry_put", val)
 
     def collect(self, monitors_to_collect = None):
         if monitors_to_collect:
@@ -183,12 +683,45 @@ class MonitorBase(EventSource):
         return self.data
 
     def add_entry(self, name, *args):
-        self.entries[name] = Entry(name, args)
-        self.data[name] = []
+        entry = Entry(name, args)
+        self.entries[name] = entry
+        self.data[name] = EntryData(entry)
+
+    def set_trace(self, trace, name):
+        """
+        Store measured values of all entries to trace file.
+
+        :param: trace: trace file
+        :type: TraceFile
+        :param: name: prefix of names of streams in trace file
+        :type: str
+        """
+        for entry_name, entry in self.entries.iteritems():
+            self.data[entry_name] = TraceEntryData(entry,
+                                                   trace,
+                                                   name + "/" + entry_name)
+
+    def set_strings(self, strings):
+        """
+        Intern strings of all entries to shared table. It is called
+        before values are measured.
+
+        :param: strings: table of strings
+        :type: StringTable
+        """
+        for entry_name, entry in self.entries.iteritems():
+            self.data[entry_name] = EntryData(entry, strings)
+
+    def flush(self):
+        for measured_data in self.data.values():
+            measured_data.flush()
+
+    def get_memory_size(self):
+        return sum(d.get_memory_size() for d in self.data.values())
 
     def clear(self):
         for measured_data in self.data.values():
-            del measured_data[:]
+            measured_data.clear()
 
 
 class Monitor(MonitorBase):
@@ -394,10 +927,17 @@ class CommunicationMonitor(Monitor):
                        "simulation_time",
                        "source_process_id",
                        "size")
+        self.add_entry("batch_send",
+                       "simulation_time",
+                       "target_process_id",
+                       "messages_count",
+                       "size",
+                       "send_time")
         process.communicator.connect("send", self.on_send)
         process.communicator.connect("receive", self.on_receive)
         process.communicator.connect("async_send", self.on_async_send)
         process.communicator.connect("async_receive", self.on_async_receive)
+        process.communicator.connect("batch_send", self.on_batch_send)
 
     def on_send(self, msg, send_time):
         self.put("send",
@@ -425,6 +965,14 @@ class CommunicationMonitor(Monitor):
                   msg.source,
                   msg.size))
 
+    def on_batch_send(self, batch, send_time):
+        self.put("batch_send",
+                 (self.process.clock.get_simulation_time(),
+                  batch.target,
+                  len(batch.data),
+                  batch.size,
+                  send_time))
+
 
 class GlobalTimeMonitor(MonitorBase):
     """
@@ -1,7 +1,9 @@
-import simpy
-import gobject
+import sys
+import heapq
+import tempfile
+import cPickle
 import monitor
-from simulator.gui.events import EventSource
+from simulator.gui.events import FastEventSource, emitter_slots
 from collections import deque
 
 
@@ -20,11 +22,15 @@ class ProcessContext():
         self.env = env
         self.arguments = arguments
         self.monitor_manager = monitor_manager
+        self.message_batching = None
+        self.message_pool = None
 
 
-class Process(EventSource):
+class Process(FastEventSource):
     """
-    Base process for simulations.
+    Base process for simulations. Process, its communicator, clock and
+    storage are slotted objects, subclasses without __slots__ (algorithms)
+    have dictionary of attributes as usual.
 
     :param: id: id of process
     :type: int
@@ -33,8 +39,11 @@ class Process(EventSource):
     :param: ctx: context of process
     :type: ProcessContext
     """
+    __slots__ = ("_sleep", "id", "name", "ctx", "block_event", "clock",
+                 "communicator") + emitter_slots(("wait", "notify", "sleep", "log"))
+
     def __init__(self, id, name, ctx):
-        EventSource.__init__(self)
+        FastEventSource.__init__(self)
         self.register_event("wait")
         self.register_event("notify")
         self.register_event("sleep")
@@ -48,10 +57,10 @@ class Process(EventSource):
         self.communicator = Communicator(self)
         self.communicator.connect("async_receive", self.on_async_receive)
         mm = ctx.monitor_manager
-        mm.register_process_monitor(self.id, monitor.ProcessMonitor(self))
-        mm.register_process_monitor(self.id, monitor.ClockMonitor(self))
-        mm.register_process_monitor(self.id, monitor.CommunicationMonitor(self))
-        mm.register_process_monitor(self.id, monitor.MemoryMonitor(self))
+        mm.add_process_monitor(self, monitor.ProcessMonitor)
+        mm.add_process_monitor(self, monitor.ClockMonitor)
+        mm.add_process_monitor(self, monitor.CommunicationMonitor)
+        mm.add_process_monitor(self, monitor.MemoryMonitor)
 
     def get_id(self):
         """
@@ -90,26 +99,49 @@ class Process(EventSource):
         :return: Simpy event
         :rtype: event
         """
-        now = self.ctx.env.now
         if sleep_time is not None:
-            if sleep_time < 0:
-                raise Exception("sleep time can't be smaller then 0")
-            self.fire("sleep", now, sleep_time)
-            mm = self.ctx.monitor_manager
-            gtm = mm.get_monitor("GlobalTimeMonitor")
+            wake_up = self._start_sleep(sleep_time)
             time_evt = self.ctx.env.timeout(sleep_time)
-
-            def time_evt_callback(e):
-                gtm.add_timeout(self.ctx.env.now, sleep_time, self.id)
-                self.clock.wait(sleep_time)
-            time_evt.callbacks.append(time_evt_callback)
+            time_evt.callbacks.append(lambda e: wake_up())
             return time_evt
 
         else:
-            self.fire("wait", now)
+            if self.fire_wait is not None:
+                self.fire_wait(self.ctx.env.now)
             self._sleep = True
             return self.block_event
 
+    def call_after(self, sleep_time, callback):
+        """
+        Sleep process for amount of 'sleep_time' like 'wait' and call
+        'callback' (without arguments) after sleep. No event is created,
+        so environment schedules only call (see Environment.call_later).
+
+        :param: sleep_time: time of sleep
+        :type: float
+        :param: callback: function called after sleep
+        :type: Function
+        """
+        wake_up = self._start_sleep(sleep_time)
+
+        def done():
+            wake_up()
+            callback()
+        self.ctx.env.call_later(sleep_time, done)
+
+    def _start_sleep(self, sleep_time):
+        if sleep_time < 0:
+            raise Exception("sleep time can't be smaller then 0")
+        if self.fire_sleep is not None:
+            self.fire_sleep(self.ctx.env.now, sleep_time)
+        gtm = self.ctx.monitor_manager.get_monitor("GlobalTimeMonitor")
+
+        def wake_up():
+            if gtm:
+                gtm.add_timeout(self.ctx.env.now, sleep_time, self.id)
+            self.clock.wait(sleep_time)
+        return wake_up
+
     def notify(self, val = None):
         """
         Wake up process if process slept.
@@ -121,18 +153,24 @@ class Process(EventSource):
             self.block_event.succeed(val)
             self.block_event = self.ctx.env.event()
             self._sleep = False
-            self.fire("notify", self.ctx.env.now)
+            if self.fire_notify is not None:
+                self.fire_notify(self.ctx.env.now)
 
     def log(self, message, msg_tag = "out"):
         """
-        Write message to simulator console.
+        Write message to simulator console. If GUI is not running
+        (headless run), message is delivered to listeners immediately.
 
         :param: message: message
         :type: str
         :param: msg_tag: type of message (out | err | warn)
         :type: str
         """
-        gobject.idle_add(self.fire, "log", message, msg_tag, priority = gobject.PRIORITY_HIGH)
+        gobject = sys.modules.get("gobject")
+        if gobject is None:
+            self.fire("log", message, msg_tag)
+        else:
+            gobject.idle_add(self.fire, "log", message, msg_tag, priority = gobject.PRIORITY_HIGH)
 
     def init_monitor_callbacks(self):
         """
@@ -145,12 +183,14 @@ class Process(EventSource):
         mm.add_process_callback("log", self.id, self)
         mm.add_process_callback("async_receive", self.id, self.communicator)
         mm.add_process_callback("async_send", self.id, self.communicator)
+        mm.add_process_callback("batch_send", self.id, self.communicator)
         mm.add_process_callback("receive", self.id, self.communicator)
         mm.add_process_callback("send", self.id, self.communicator)
         mm.add_process_callback("time_stamp", self.id, self.clock)
         mm.add_process_callback("step", self.id, self.clock)
         gtm = mm.get_monitor("GlobalTimeMonitor")
-        mm.add_callback("timeout", gtm)
+        if gtm:
+            mm.add_callback("timeout", gtm)
 
     def post_init(self):
         """
@@ -158,7 +198,15 @@ class Process(EventSource):
         """
         mm = self.ctx.monitor_manager
         gtm = mm.get_monitor("GlobalTimeMonitor")
-        gtm.add_timeout(0, 0, self.id)
+        if gtm:
+            gtm.add_timeout(0, 0, self.id)
+
+    def close(self):
+        """
+        Release resources of process. It is called by simulation
+        after run of simulation finishes or is stopped.
+        """
+        pass
 
     def init(self):
         """
@@ -201,6 +249,7 @@ class GraphProcess(Process):
     """
     Graph process for simulations. This process is for solving graphs of state spaces.
     """
+    __slots__ = emitter_slots(("edge_discovered", "edge_calculated"))
     NAME = "Unknow"
     DESCRIPTION = "No description"
     ARGUMENTS = {}
@@ -209,11 +258,14 @@ class GraphProcess(Process):
         Process.__init__(self, id, self.NAME, ctx)
         self.register_event("edge_discovered")
         self.register_event("edge_calculated")
-        ctx.monitor_manager.register_process_monitor(id, monitor.EdgeMonitor(self))
+        ctx.monitor_manager.add_process_monitor(self, monitor.EdgeMonitor)
 
     def solve_edge(self, edge):
         """Solve given edge. This will sleep current process for
-        time based on environment and solve edge.
+        time based on environment and solve edge. Completion of edge
+        is scheduled directly on environment (see call_after), no new
+        Simpy process is created. Returned event is triggered after
+        edge is calculated.
 
         :param: edge: edge
         :type: Edge
@@ -222,28 +274,31 @@ class GraphProcess(Process):
         """
         gs = self.ctx.graph_stats
         gs.discover_edge(edge, self)
-        self.fire("edge_discovered",
-                  self.ctx.env.now,
-                  self.id,
-                  edge.get_time(),
-                  edge.get_label(),
-                  edge.get_source().get_id(),
-                  edge.get_target().get_id())
-
-        def edge_gen():
-            calculating_time = self.calculate_edge_time(edge)
-            yield self.wait(calculating_time)
+        if self.fire_edge_discovered is not None:
+            self.fire_edge_discovered(self.ctx.env.now,
+                                      self.id,
+                                      edge.get_time(),
+                                      edge.get_label(),
+                                      edge.get_source().get_id(),
+                                      edge.get_target().get_id())
+
+        calculating_time = self.calculate_edge_time(edge)
+        done_evt = self.ctx.env.event()
+
+        def edge_calculated():
             gs.calculate_edge(edge, self)
-            self.fire("edge_calculated",
-                      self.ctx.env.now,
-                      self.id,
-                      edge.get_time(),
-                      calculating_time,
-                      edge.get_label(),
-                      edge.get_source().get_id(),
-                      edge.get_target().get_id())
-
-        return self.ctx.env.process(edge_gen())
+            if self.fire_edge_calculated is not None:
+                self.fire_edge_calculated(self.ctx.env.now,
+                                          self.id,
+                                          edge.get_time(),
+                                          calculating_time,
+                                          edge.get_label(),
+                                          edge.get_source().get_id(),
+                                          edge.get_target().get_id())
+            done_evt.succeed()
+
+        self.call_after(calculating_time, edge_calculated)
+        return done_evt
 
     def init_monitor_callbacks(self):
         Process.init_monitor_callbacks(self)
@@ -271,10 +326,12 @@ class StorageProcess(GraphProcess):
     :param: storage: storage
     :type: Storage
     """
+    __slots__ = ("storage",)
+
     def __init__(self, id, name, ctx, storage):
         GraphProcess.__init__(self, id, name, ctx)
         self.storage = storage
-        ctx.monitor_manager.register_process_monitor(id, monitor.StorageMonitor(self))
+        ctx.monitor_manager.add_process_monitor(self, monitor.StorageMonitor)
 
     def get_used_memory(self):
         return self.storage.get_size()
@@ -288,6 +345,10 @@ class StorageProcess(GraphProcess):
     def on_async_receive(self, msg):
         self.storage.put_item(msg.data)
 
+    def close(self):
+        GraphProcess.close(self)
+        self.storage.close()
+
     def init_monitor_callbacks(self):
         GraphProcess.init_monitor_callbacks(self)
         mm = self.ctx.monitor_manager
@@ -296,9 +357,10 @@ class StorageProcess(GraphProcess):
         mm.add_process_callback("changed", self.id, self.storage)
 
 
-class Message():
+class Message(object):
     """
     Message structure used for sending messages through processes.
+    Message is slotted record without dictionary of attributes.
 
     :param: data: data of message
     :type: Object
@@ -311,6 +373,8 @@ class Message():
     :param: size: size of message
     :type: int
     """
+    __slots__ = ("data", "target", "source", "tag", "size")
+
     def __init__(self, data, source, target, tag, size):
         self.data = data
         self.target = target
@@ -319,26 +383,287 @@ class Message():
         self.size = size
 
 
-class Communicator(EventSource):
+class MessageBatch(Message):
+    """
+    Asynchronous messages from one process to other process transferred
+    together. Size of batch is sum of sizes of messages, so network model
+    evaluates cost of batch as one transfer.
+
+    :param: messages: messages in batch
+    :type: list of Message
+    """
+    __slots__ = ()
+
+    def __init__(self, messages, source, target):
+        Message.__init__(self, messages, source, target, None,
+                         sum(m.size for m in messages))
+
+
+class MessagePool():
+    """
+    Pool of recycled asynchronous messages. Message is returned to pool
+    after it is delivered and listeners of 'async_receive' were called,
+    so listeners must not keep references to messages (monitors store
+    only values of messages). Messages of blocking send are never
+    recycled, because they are returned by receive.
+
+    :param: size: maximum count of messages kept in pool
+    :type: int
+    """
+    def __init__(self, size = 4096):
+        self.size = size
+        self.messages = []
+        self.created_count = 0
+        self.reused_count = 0
+
+    def create(self, data, source, target, tag, size):
+        """
+        Returns message from pool or new message if pool is empty.
+        """
+        messages = self.messages
+        if messages:
+            msg = messages.pop()
+            msg.data = data
+            msg.source = source
+            msg.target = target
+            msg.tag = tag
+            msg.size = size
+            self.reused_count += 1
+            return msg
+        self.created_count += 1
+        return Message(data, source, target, tag, size)
+
+    def release(self, msg):
+        """
+        Return delivered message to pool.
+        """
+        msg.data = None
+        if len(self.messages) < self.size:
+            self.messages.append(msg)
+
+
+class MessageBatching():
+    """
+    Settings of batching of asynchronous messages. Messages to same
+    target are collected to batch, which is sent after 'window' time
+    since its first message or when it has 'size' messages.
+
+    :param: window: time messages wait in batch (0 sends batch after\
+    other events of same simulation time)
+    :type: float
+    :param: size: maximum count of messages in batch (unlimited if None)
+    :type: int | None
+    """
+    def __init__(self, window = 0, size = None):
+        if window < 0:
+            raise Exception("Batch window can't be smaller then 0")
+        if size is not None and size < 1:
+            raise Exception("Batch size must be greater than 0")
+        self.window = window
+        self.size = size
+
+
+class Mailbox():
+    """
+    Store of received messages indexed by source and by (source, tag).
+    Messages are retrieved in FIFO order, so message is same as message
+    found by filter over all messages in order of arrival. Messages
+    removed through one index are removed from other index lazily.
+
+    Message put to mailbox can be taken by 'get_now' immediately,
+    but pending requests of 'get' are matched when returned event
+    is processed (like Simpy FilterStore does).
+
+    :param: env: environment
+    :type: Environment
+    """
+    def __init__(self, env):
+        self.env = env
+        self.size = 0
+        self.counter = 0
+        self.sources = {} # key -> source, value -> queue of entries
+        self.keys = {} # key -> (source, tag), value -> queue of entries
+        self.source_counts = {}
+        self.key_counts = {}
+        self.requests = [] # pending requests (event, source, tag)
+
+    def __len__(self):
+        return self.size
+
+    def get_count(self, sources = None):
+        """
+        Returns count of messages.
+
+        :param: sources: ids of source processes (all messages if None)
+        :type: list of int | None
+        :return: count of messages
+        :rtype: int
+        """
+        if sources is None:
+            return self.size
+        counts = self.source_counts
+        return sum(counts.get(s, 0) for s in set(sources))
+
+    def put(self, msg):
+        """
+        Put message to mailbox.
+
+        :param: msg: message
+        :type: Message
+        :return: triggered event, pending requests are matched\
+        when event is processed
+        :rtype: event
+        """
+        # entry is [order, message], message is None after removal
+        entry = [self.counter, msg]
+        self.counter += 1
+        self.size += 1
+        source = msg.source
+        key = (source, msg.tag)
+        queue = self.sources.get(source)
+        if queue is None:
+            self.sources[source] = queue = deque()
+            self.source_counts[source] = 0
+        queue.append(entry)
+        self.source_counts[source] += 1
+        queue = self.keys.get(key)
+        if queue is None:
+            self.keys[key] = queue = deque()
+            self.key_counts[key] = 0
+        queue.append(entry)
+        self.key_counts[key] += 1
+
+        evt = self.env.event()
+        evt.succeed()
+        evt.callbacks.append(self._match_requests)
+        return evt
+
+    def get(self, source = None, tag = None):
+        """
+        Request first message from 'source' with 'tag'.
+
+        :param: source: id of source process (any source if None)
+        :type: int | None
+        :param: tag: tag of message (any tag if None)
+        :type: str | None
+        :return: event triggered with message
+        :rtype: event
+        """
+        evt = self.env.event()
+        self.requests.append((evt, source, tag))
+        self._match_requests()
+        return evt
+
+    def get_now(self, source = None, tag = None):
+        """
+        Returns first message from 'source' with 'tag' or None
+        if there is no such message. Attribute 'source' can be
+        list of ids of processes (tag is not used).
+        """
+        if type(source) is list:
+            entry = self._find_first(source)
+        else:
+            entry = self._find(source, tag)
+        if entry is None:
+            return None
+        return self._remove(entry)
+
+    def _match_requests(self, event = None):
+        requests = self.requests
+        idx = 0
+        while idx < len(requests) and self.size:
+            evt, source, tag = requests[idx]
+            entry = self._find(source, tag)
+            if entry is None:
+                idx += 1
+            else:
+                requests.pop(idx)
+                evt.succeed(self._remove(entry))
+
+    def _head(self, queue):
+        while queue and queue[0][1] is None:
+            queue.popleft()
+        if queue:
+            return queue[0]
+        return None
+
+    def _find(self, source, tag):
+        if source is None:
+            return self._find_first(self.sources.keys())
+        if tag is None:
+            queue = self.sources.get(source)
+        else:
+            queue = self.keys.get((source, tag))
+        if queue is None:
+            return None
+        return self._head(queue)
+
+    def _find_first(self, sources):
+        first = None
+        for s in sources:
+            queue = self.sources.get(s)
+            if queue is not None:
+                entry = self._head(queue)
+                if entry is not None and (first is None or entry[0] < first[0]):
+                    first = entry
+        return first
+
+    def _remove(self, entry):
+        msg = entry[1]
+        entry[1] = None
+        self.size -= 1
+        source = msg.source
+        key = (source, msg.tag)
+        self.source_counts[source] -= 1
+        if self.source_counts[source] == 0:
+            del self.sources[source]
+            del self.source_counts[source]
+        else:
+            self._head(self.sources[source])
+        self.key_counts[key] -= 1
+        if self.key_counts[key] == 0:
+            del self.keys[key]
+            del self.key_counts[key]
+        else:
+            self._head(self.keys[key])
+        return msg
+
+
+class Communicator(FastEventSource):
     """
     Communicator for communication between processes.
 
     :param: process: process
     :type: Process
     """
+    __slots__ = ("process", "batches", "_batched_evt", "_mailbox", "rec") + \
+        emitter_slots(("send", "receive", "async_send", "async_receive",
+                       "batch_send"))
+
     def __init__(self, process):
-        EventSource.__init__(self)
+        FastEventSource.__init__(self)
         self.register_event("send")
         self.register_event("receive")
         self.register_event("async_send")
         self.register_event("async_receive")
+        self.register_event("batch_send")
         self.process = process
-        self._msg_store = simpy.FilterStore(process.ctx.env)
+        self.batches = {} # key -> target, value -> messages waiting in batch
+        self._batched_evt = None
+        self._mailbox = Mailbox(process.ctx.env)
         self.rec = True
 
     def async_send(self, data, target, tag = None, size = 1):
         """
-        Asynchronous send message to other process.
+        Asynchronous send message to other process. Delivery of message
+        is scheduled directly on environment (see call_after), no new
+        Simpy process is created. Returned event is triggered after
+        message is delivered.
+
+        If batching of messages is set in context (see MessageBatching),
+        message is added to batch for target and returned event is
+        triggered immediately. If message pool is set in context (see
+        MessagePool), message is recycled after delivery.
 
         :param: data: data for other process
         :type: Object
@@ -352,28 +677,76 @@ class Communicator(EventSource):
         :rtype: event
         """
         ctx = self.process.ctx
-        msg = Message(data, self.process.id, target, tag, size)
-
-        def asend_gen():
-            send_time  = self.calculate_send_time(msg)
-            self.fire("async_send", msg, send_time)
-            yield self.process.wait(send_time)
+        pool = ctx.message_pool
+        if pool:
+            msg = pool.create(data, self.process.id, target, tag, size)
+        else:
+            msg = Message(data, self.process.id, target, tag, size)
+        if ctx.message_batching:
+            return self._add_to_batch(msg, ctx.message_batching)
+        send_time = self.calculate_send_time(msg)
+        if self.fire_async_send is not None:
+            self.fire_async_send(msg, send_time)
+        done_evt = ctx.env.event()
+
+        def deliver():
             target_process = ctx.processes[target]
             target_process.communicator._async_receive(msg)
-
-        return ctx.env.process(asend_gen())
+            if pool:
+                pool.release(msg)
+            done_evt.succeed()
+
+        self.process.call_after(send_time, deliver)
+        return done_evt
+
+    def _add_to_batch(self, msg, batching):
+        env = self.process.ctx.env
+        target = msg.target
+        messages = self.batches.get(target)
+        if messages is None:
+            messages = self.batches[target] = []
+            if batching.size != 1:
+                env.call_later(batching.window,
+                               lambda: self._send_batch(target, messages))
+        messages.append(msg)
+        if batching.size is not None and len(messages) >= batching.size:
+            self._send_batch(target, messages)
+        # sender is not blocked, after this event is processed, it resumes
+        # sender immediately without scheduling of new event
+        if self._batched_evt is None:
+            self._batched_evt = env.event().succeed()
+        return self._batched_evt
+
+    def _send_batch(self, target, messages):
+        # batch could be already sent, because it was full
+        if self.batches.get(target) is not messages:
+            return
+        del self.batches[target]
+        ctx = self.process.ctx
+        batch = MessageBatch(messages, self.process.id, target)
+        send_time = self.calculate_send_time(batch)
+        if self.fire_batch_send is not None:
+            self.fire_batch_send(batch, send_time)
+        fire_async_send = self.fire_async_send
+        if fire_async_send is not None:
+            for msg in messages:
+                fire_async_send(msg, send_time)
+
+        def deliver():
+            communicator = ctx.processes[target].communicator
+            pool = ctx.message_pool
+            for msg in messages:
+                communicator._async_receive(msg)
+                if pool:
+                    pool.release(msg)
+
+        ctx.env.call_later(send_time, deliver)
 
     def _async_receive(self, data):
-        self.fire("async_receive", data)
+        if self.fire_async_receive is not None:
+            self.fire_async_receive(data)
         self.process.notify()
 
-    def _check_msg(self, m_source, m_tag, target, tag):
-        if m_source == target:
-            if tag is not None:
-                return m_tag == tag
-            return True
-        return False
-
     def send(self, data, target, tag = None, size = 1):
         """
         Blocking send message to other process.
@@ -400,10 +773,9 @@ class Communicator(EventSource):
             send_time = self.calculate_send_time(msg)
             yield self.process.wait(send_time)
             target_process = ctx.processes[target]
-            com = target_process.communicator
-            evt = com._msg_store.put(msg)
-            if evt.triggered:
-                self.fire("send", evt.item, send_time)
+            evt = target_process.communicator._mailbox.put(msg)
+            if self.fire_send is not None:
+                self.fire_send(msg, send_time)
             yield evt
 
         return ctx.env.process(send_gen())
@@ -425,12 +797,8 @@ class Communicator(EventSource):
         if source and (source < 0 or source >= len(ctx.processes)):
             raise Exception("Unknown source for receive message")
 
-        def match(msg):
-            if source is None:
-                return True
-            return self._check_msg(msg.source, msg.tag, source, tag)
-
-        evt = self._msg_store.get(match)
+        # tag is used only with source
+        evt = self._mailbox.get(source, tag if source is not None else None)
         if evt.triggered:
             self.fire("receive", evt.value)
         else:
@@ -456,40 +824,14 @@ class Communicator(EventSource):
         :rtype: Message | None
         """
         ctx = self.process.ctx
-
-        def target_check(t):
-            if t < 0 or t >= len(ctx.processes):
-                raise Exception("Unknown source for receive message")
-
-        def match(msg):
-            return self._check_msg(msg.source, msg.tag, source, tag)
-
-        def multi_match(msg):
-            for s in source:
-                m = self._check_msg(msg.source,
-                                    msg.tag,
-                                    s,
-                                    None)
-                if m:
-                    return True
-            return False
-
-        def any_target(msg):
-            return True
-
         if type(source) is list:
             for s in source:
-                target_check(s)
-            evt = self._msg_store.get(multi_match)
+                if s < 0 or s >= len(ctx.processes):
+                    raise Exception("Unknown source for receive message")
+            return self._mailbox.get_now(source)
         elif source:
-            evt = self._msg_store.get(match)
-        else:
-            evt = self._msg_store.get(any_target)
-
-        if evt.triggered:
-            return evt.value
-        else:
-            return None
+            return self._mailbox.get_now(source, tag)
+        return self._mailbox.get_now()
 
     def get_n_messages(self, pids = None):
         """
@@ -502,13 +844,7 @@ class Communicator(EventSource):
         :return: count of messages
         :rtype: int
         """
-        if pids is None:
-            return len(self._msg_store.items)
-        count = 0
-        for msg in self._msg_store.items:
-            if msg.source in pids:
-                count += 1
-        return count
+        return self._mailbox.get_count(pids)
 
     def calculate_send_time(self, msg):
         """
@@ -524,15 +860,17 @@ class Communicator(EventSource):
         return network_model.evaluate_cost(msg)
 
 
-class Clock(EventSource):
+class Clock(FastEventSource):
     """
     Clock containing time values for given process.
 
     :param: process: process
     :type: Process
     """
+    __slots__ = ("process", "time", "steps") + emitter_slots(("time_stamp", "step"))
+
     def __init__(self, process):
-        EventSource.__init__(self)
+        FastEventSource.__init__(self)
         self.register_event("time_stamp")
         self.register_event("step")
         self.process = process
@@ -540,11 +878,13 @@ class Clock(EventSource):
         self.steps = 0
 
     def wait(self, time):
-        self.fire("time_stamp", self.time, time)
+        if self.fire_time_stamp is not None:
+            self.fire_time_stamp(self.time, time)
         self.time += time
 
     def tick(self):
-        self.fire("step", self.steps, self.steps + 1)
+        if self.fire_step is not None:
+            self.fire_step(self.steps, self.steps + 1)
         self.steps += 1
 
     def get_time(self):
@@ -584,15 +924,17 @@ class Clock(EventSource):
         return self.get_simulation_time() - self.get_time()
 
 
-class Storage(EventSource):
+class Storage(FastEventSource):
     """
     Internal storage for saving nodes of graph.
 
     :param: process: process
     :type: Process
     """
+    __slots__ = ("process", "peak") + emitter_slots(("changed", "push", "pop"))
+
     def __init__(self, process):
-        EventSource.__init__(self)
+        FastEventSource.__init__(self)
         self.register_event("changed")
         self.register_event("push")
         self.register_event("pop")
@@ -600,24 +942,37 @@ class Storage(EventSource):
         self.peak = 0
 
     def put(self, value):
-        sim_time = self.process.clock.get_simulation_time()
         self.put_item(value)
-        self.fire("push", sim_time, self.get_size())
-        self.fire("changed",
-                  sim_time,
-                  self.get_size())
-        if self.get_size() > self.peak:
-            self.peak = self.get_size()
+        size = self.get_size()
+        if self.fire_push is not None or self.fire_changed is not None:
+            sim_time = self.process.ctx.env.now
+            if self.fire_push is not None:
+                self.fire_push(sim_time, size)
+            if self.fire_changed is not None:
+                self.fire_changed(sim_time, size)
+        if size > self.peak:
+            self.peak = size
 
     def get(self):
-        sim_time = self.process.clock.get_simulation_time()
         item = self.get_item()
-        self.fire("pop", sim_time, self.get_size())
-        self.fire("changed",
-                  sim_time,
-                  self.get_size())
+        if self.fire_pop is not None or self.fire_changed is not None:
+            self._fire_pop()
         return item
 
+    def _fire_pop(self):
+        sim_time = self.process.ctx.env.now
+        size = self.get_size()
+        if self.fire_pop is not None:
+            self.fire_pop(sim_time, size)
+        if self.fire_changed is not None:
+            self.fire_changed(sim_time, size)
+
+    def close(self):
+        """
+        Release resources of storage (e.g. temporary files).
+        """
+        pass
+
     def get_memory_peak(self):
         """
         Returns maximum of used memory on storage.
@@ -660,6 +1015,8 @@ class QueueStorage(Storage):
     """
     Implementation of storage based on Queue (FIFO).
     """
+    __slots__ = ("container",)
+
     def __init__(self, process):
         Storage.__init__(self, process)
         self.container = deque()
@@ -678,6 +1035,8 @@ class StackStorage(Storage):
     """
     Implementation of storage based on Stack (LIFO).
     """
+    __slots__ = ("container",)
+
     def __init__(self, process):
         Storage.__init__(self, process)
         self.container = []
@@ -691,3 +1050,204 @@ class StackStorage(Storage):
     def get_size(self):
         return len(self.container)
 
+
+class _Reversed(object):
+    """
+    Key of item with inverted ordering (see PriorityStorage).
+    """
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class PriorityStorage(Storage):
+    """
+    Implementation of storage based on binary heap. Item with smallest
+    key is returned first, items with same key are returned in order
+    of insertion. Put and get take O(log n).
+
+    Example of key: lambda node: node.get_size()
+
+    :param: key: function returning priority of item (item itself if None)
+    :type: Function | None
+    :param: reverse: return item with largest key first
+    :type: bool
+    """
+    __slots__ = ("container", "key", "reverse", "counter")
+
+    def __init__(self, process, key = None, reverse = False):
+        Storage.__init__(self, process)
+        self.container = [] # heap of entries [priority, order, item]
+        self.key = key
+        self.reverse = reverse
+        self.counter = 0
+
+    def put_item(self, val):
+        priority = self.key(val) if self.key else val
+        if self.reverse:
+            priority = _Reversed(priority)
+        heapq.heappush(self.container, (priority, self.counter, val))
+        self.counter += 1
+
+    def get_item(self):
+        return heapq.heappop(self.container)[2]
+
+    def get_size(self):
+        return len(self.container)
+
+
+class WorkStealingStorage(Storage):
+    """
+    Implementation of work-stealing deque. Owner of storage puts
+    and gets items at one end (LIFO), other processes steal oldest
+    items at other end (see 'steal'). All operations take O(1).
+    """
+    __slots__ = ("container",)
+
+    def __init__(self, process):
+        Storage.__init__(self, process)
+        self.container = deque()
+
+    def steal(self):
+        """
+        Returns oldest item of storage. It is called by other process
+        than owner of storage. Listeners of 'pop' and 'changed' events
+        of storage are notified as by 'get'.
+
+        :return: item from storage
+        :rtype: Object
+        """
+        item = self.steal_item()
+        if self.fire_pop is not None or self.fire_changed is not None:
+            self._fire_pop()
+        return item
+
+    def steal_item(self):
+        return self.container.popleft()
+
+    def put_item(self, val):
+        self.container.append(val)
+
+    def get_item(self):
+        return self.container.pop()
+
+    def get_size(self):
+        return len(self.container)
+
+
+class SpillStorage(Storage):
+    """
+    Implementation of storage based on Queue (FIFO), which keeps at most
+    'capacity' items in memory. Newest items are written to temporary
+    file in chunks of 'chunk_size' items and chunks are read back when
+    items in memory are consumed. Put and get take amortized O(1).
+
+    Items are written by 'dump' and read by 'load' functions, by default
+    nodes of graph are written as ids of nodes.
+
+    :param: capacity: maximum count of items in memory
+    :type: int
+    :param: chunk_size: count of items written to file at once\
+    (half of capacity if None)
+    :type: int | None
+    :param: directory: directory of temporary file (system default if None)
+    :type: str | None
+    :param: dump: function returning serializable value of item
+    :type: Function | None
+    :param: load: function returning item from serialized value
+    :type: Function | None
+    """
+    __slots__ = ("capacity", "chunk_size", "directory", "dump", "load",
+                 "head", "tail", "chunks", "spilled_size", "file",
+                 "spill_count", "load_count")
+
+    def __init__(self, process, capacity = 100000, chunk_size = None,
+                 directory = None, dump = None, load = None):
+        Storage.__init__(self, process)
+        if chunk_size is None:
+            chunk_size = capacity // 2
+        if chunk_size < 1 or chunk_size * 2 > capacity:
+            raise Exception("Chunk size of spill storage must be between 1 and half of capacity")
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.directory = directory
+        self.dump = dump or self._dump_node
+        self.load = load or self._load_node
+        self.head = deque() # oldest items
+        self.tail = [] # newest items, written to file when chunk is full
+        self.chunks = deque() # offsets of chunks in file, oldest first
+        self.spilled_size = 0
+        self.file = None
+        self.spill_count = 0
+        self.load_count = 0
+
+    def _dump_node(self, node):
+        return node.get_id()
+
+    def _load_node(self, id):
+        return self.process.ctx.graph.get_node(id)
+
+    def put_item(self, val):
+        if (not self.chunks and not self.tail and
+                len(self.head) < self.capacity - self.chunk_size):
+            self.head.append(val)
+            return
+        self.tail.append(val)
+        if len(self.tail) >= self.chunk_size:
+            self._spill()
+
+    def get_item(self):
+        if not self.head:
+            if self.chunks:
+                self._load()
+            elif self.tail:
+                self.head = deque(self.tail)
+                self.tail = []
+            else:
+                raise IndexError("get from empty storage")
+        return self.head.popleft()
+
+    def get_size(self):
+        return len(self.head) + self.spilled_size + len(self.tail)
+
+    def close(self):
+        """
+        Close temporary file, items written to file are lost. It is called
+        when simulation finishes (see Process.close).
+        """
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.chunks.clear()
+        self.spilled_size = 0
+
+    def _spill(self):
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(prefix = "storage", dir = self.directory)
+        f = self.file
+        f.seek(0, 2)
+        self.chunks.append(f.tell())
+        dump = self.dump
+        cPickle.dump([dump(val) for val in self.tail], f, cPickle.HIGHEST_PROTOCOL)
+        self.spilled_size += len(self.tail)
+        self.tail = []
+        self.spill_count += 1
+
+    def _load(self):
+        f = self.file
+        f.seek(self.chunks.popleft())
+        load = self.load
+        self.head = deque(load(val) for val in cPickle.load(f))
+        self.spilled_size -= len(self.head)
+        self.load_count += 1
+        if not self.chunks:
+            # all chunks were read, space of file is reused
+            f.seek(0)
+            f.truncate()
@@ -0,0 +1,307 @@
+"""
+Trace file used by monitors for storing measured values on disk
+during simulation.
+
+File consists of records. Each record starts with header (kind, stream id,
+count). Stream record declares new stream (entry of monitor) and chunk
+record contains values of stream. Values in chunk are stored by columns
+in fixed-size binary form (native sizes and byte order): integer, float
+and bool columns as arrays and string columns as indexes to table
+of strings of chunk. Table of strings is written with each chunk, so
+memory of writer doesn't grow with count of distinct strings in trace.
+
+Column contains integers, floats (integers mixed with floats are stored
+as floats), bools or strings (with None), other values are not supported.
+"""
+import json
+import struct
+from array import array
+from itertools import izip
+
+INDEX = "l"
+NUMBER_TYPES = set([int, long, float])
+BOOL_TYPES = set([bool])
+STRING_TYPES = set([str, unicode, type(None)])
+
+
+class StringTable():
+    """
+    Table of interned strings. Each distinct string is stored once
+    and values are referenced by indexes to table (None by -1).
+
+    :param: typecode: typecode of arrays of indexes
+    :type: str
+    """
+    def __init__(self, typecode = INDEX):
+        self.typecode = typecode
+        self.strings = []
+        self.index = {} # key -> string, value -> index
+
+    def __len__(self):
+        return len(self.strings)
+
+    def encode(self, values):
+        """
+        Returns indexes of values, new strings are added to table.
+
+        :param: values: strings or None
+        :type: sequence
+        :return: indexes of values
+        :rtype: array
+        :raise TypeError: value is not string or None
+        """
+        data = array(self.typecode)
+        index = self.index
+        strings = self.strings
+        for v in values:
+            if v is None:
+                data.append(-1)
+                continue
+            i = index.get(v)
+            if i is None:
+                if not isinstance(v, basestring):
+                    raise TypeError("Value {0!r} is not string".format(v))
+                i = len(strings)
+                index[v] = i
+                strings.append(v)
+            data.append(i)
+        return data
+
+    def get(self, i):
+        if i < 0:
+            return None
+        return self.strings[i]
+
+    def decode(self, data):
+        """
+        Returns values of indexes.
+
+        :param: data: indexes of values
+        :type: sequence of int
+        :rtype: list
+        """
+        strings = self.strings
+        return [strings[i] if i >= 0 else None for i in data]
+
+    def get_memory_size(self):
+        """
+        Returns estimated memory size of table in bytes (string,
+        its reference in list and entry in index).
+        """
+        return sum(len(s) + 120 for s in self.strings)
+
+
+class TraceFile():
+    """
+    Chunked trace file. File is written during simulation and chunks
+    are read back lazily.
+
+    :param: filename: name of trace file
+    :type: str
+    :param: mode: "w" for new trace file, "r" for reading existing file
+    :type: str
+    """
+    STREAM = 1
+    CHUNK = 2
+
+    HEADER = struct.Struct("<BiI")
+    LENGTH = struct.Struct("<I")
+    STRING_HEADER = struct.Struct("<BI") # (is unicode, length)
+
+    INT = "l"
+    FLOAT = "d"
+    BOOL = "?"
+    STRING = "s"
+    ARRAY_TYPECODES = {INT: INT, FLOAT: FLOAT, BOOL: "b", STRING: INDEX}
+
+    def __init__(self, filename, mode = "w"):
+        self.filename = filename
+        self.streams = [] # (name, args)
+        self.chunks = [] # for each stream list of (offset, count, typecodes)
+        self.writer = None
+        self.reader = None
+        self.offset = 0
+        if mode == "w":
+            self.writer = open(filename, "wb")
+        elif mode == "r":
+            self._load()
+        else:
+            raise Exception("Unknown trace file mode '{0}'".format(mode))
+
+    def get_filename(self):
+        return self.filename
+
+    def add_stream(self, name, args):
+        """
+        Declare new stream of values.
+
+        :param: name: name of stream
+        :type: str
+        :param: args: names of values in stream
+        :type: list of str
+        :return: id of stream
+        :rtype: int
+        """
+        stream_id = len(self.streams)
+        self.streams.append((name, list(args)))
+        self.chunks.append([])
+        data = json.dumps({"name": name, "args": list(args)})
+        self._write(self.HEADER.pack(self.STREAM, stream_id, len(data)) + data)
+        return stream_id
+
+    def get_streams(self):
+        """
+        Returns declared streams.
+
+        :return: list of (name, args)
+        :rtype: list of tuple
+        """
+        return self.streams
+
+    def get_chunks(self, stream_id):
+        return self.chunks[stream_id]
+
+    def write_chunk(self, stream_id, rows):
+        """
+        Write values to stream.
+
+        :param: stream_id: id of stream
+        :type: int
+        :param: rows: tuples of values
+        :type: list of tuple
+        :raise TypeError: column contains unsupported values
+        """
+        typecodes = []
+        parts = []
+        table = StringTable()
+        for values in izip(*rows):
+            typecode, data = self._encode_column(values, table)
+            typecodes.append(typecode)
+            parts.append(data.tostring())
+
+        typecodes = "".join(typecodes)
+        strings = self._encode_strings(table)
+        header = self.HEADER.pack(self.CHUNK, stream_id, len(rows)) + typecodes
+        self.chunks[stream_id].append((self.offset + len(header),
+                                       len(rows),
+                                       typecodes))
+        self._write(header + self.LENGTH.pack(len(strings)) + strings + "".join(parts))
+
+    def read_chunk(self, stream_id, chunk_index):
+        """
+        Read values of chunk.
+
+        :param: stream_id: id of stream
+        :type: int
+        :param: chunk_index: index of chunk in stream
+        :type: int
+        :return: columns of chunk
+        :rtype: list of sequences
+        """
+        offset, count, typecodes = self.chunks[stream_id][chunk_index]
+        reader = self._get_reader()
+        reader.seek(offset)
+        length = self.LENGTH.unpack(reader.read(self.LENGTH.size))[0]
+        table = self._decode_strings(reader.read(length))
+        columns = []
+        for typecode in typecodes:
+            data = array(self.ARRAY_TYPECODES[typecode])
+            data.fromstring(reader.read(count * data.itemsize))
+            if typecode == self.STRING:
+                data = table.decode(data)
+            elif typecode == self.BOOL:
+                data = [bool(v) for v in data]
+            columns.append(data)
+        return columns
+
+    def flush(self):
+        if self.writer:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+
+    def _write(self, data):
+        if not self.writer:
+            raise Exception("Trace file '{0}' is closed".format(self.filename))
+        self.writer.write(data)
+        self.offset += len(data)
+
+    def _get_reader(self):
+        if self.writer:
+            self.writer.flush()
+        if not self.reader:
+            self.reader = open(self.filename, "rb")
+        return self.reader
+
+    def _encode_column(self, values, table):
+        types = set(type(v) for v in values)
+        if types <= NUMBER_TYPES:
+            if float not in types:
+                try:
+                    return self.INT, array(self.INT, values)
+                except OverflowError:
+                    pass
+            else:
+                return self.FLOAT, array(self.FLOAT, values)
+        elif types == BOOL_TYPES:
+            return self.BOOL, array(self.ARRAY_TYPECODES[self.BOOL], values)
+        elif types <= STRING_TYPES:
+            return self.STRING, table.encode(values)
+        raise TypeError("Values of types {0} can't be stored in trace file".format(
+            ", ".join(sorted(t.__name__ for t in types))))
+
+    def _encode_strings(self, table):
+        parts = []
+        for s in table.strings:
+            is_unicode = isinstance(s, unicode)
+            if is_unicode:
+                s = s.encode("utf-8")
+            parts.append(self.STRING_HEADER.pack(is_unicode, len(s)))
+            parts.append(s)
+        return "".join(parts)
+
+    def _decode_strings(self, data):
+        table = StringTable()
+        strings = table.strings
+        offset = 0
+        size = self.STRING_HEADER.size
+        while offset < len(data):
+            is_unicode, length = self.STRING_HEADER.unpack_from(data, offset)
+            offset += size
+            s = data[offset:offset + length]
+            offset += length
+            strings.append(s.decode("utf-8") if is_unicode else s)
+        return table
+
+    def _load(self):
+        reader = self._get_reader()
+        reader.seek(0)
+        header_size = self.HEADER.size
+        while True:
+            header = reader.read(header_size)
+            if len(header) < header_size:
+                break
+            kind, stream_id, count = self.HEADER.unpack(header)
+            if kind == self.STREAM:
+                stream = json.loads(reader.read(count))
+                self.streams.append((str(stream["name"]),
+                                     [str(a) for a in stream["args"]]))
+                self.chunks.append([])
+            elif kind == self.CHUNK:
+                width = len(self.streams[stream_id][1])
+                typecodes = reader.read(width)
+                offset = reader.tell()
+                self.chunks[stream_id].append((offset, count, typecodes))
+                size = self.LENGTH.size
+                size += self.LENGTH.unpack(reader.read(self.LENGTH.size))[0]
+                for typecode in typecodes:
+                    size += array(self.ARRAY_TYPECODES[typecode]).itemsize * count
+                reader.seek(offset + size)
+            else:
+                raise Exception("Trace file '{0}' is corrupted".format(self.filename))
@@ -0,0 +1,313 @@
+"""
+Profiling of simulation runs.
+
+Profiler is set to one simulation (see AbstractSimulation.set_profiler)
+and instruments only objects of that simulation, so other simulations
+run without any overhead. It counts processed events by type and
+measures time spent in phases of simulation loop:
+
+- step: processing of events by environment (dispatch of callbacks
+  and code of algorithms), without time of other phases
+- schedule: scheduling of events in environment
+- fire: listeners of events of processes, without monitor put
+- monitor: storing of measured values by monitors
+- graph_stats: bookkeeping of discovered and calculated nodes and edges
+
+Time of nested phase is not counted to outer phase. Instead of phases,
+functions can be profiled by cProfile ('cprofile' mode) or by sampling
+profiler ('sampling' mode, only on platforms with signal.setitimer),
+wrappers of phases would distort their results.
+"""
+import cProfile
+import pstats
+import signal
+import timeit
+
+MODES = ["events", "cprofile", "sampling"]
+PHASES = ["step", "schedule", "fire", "monitor", "graph_stats"]
+GRAPH_STATS_METHODS = ["discover_node", "discover_edge", "calculate_edge",
+                       "is_node_discovered", "is_edge_discovered",
+                       "is_edge_calculated"]
+SAMPLING_INTERVAL = 0.001
+REPORT_LIMIT = 30
+
+
+def _function_name(filename, line, name):
+    return "{0} ({1}:{2})".format(name, filename, line)
+
+
+class SimulationProfiler():
+    """
+    Profiler of one simulation run.
+
+    :param: mode: 'events' (counts of events and times of phases),\
+    'cprofile' or 'sampling' (counts of events and profiled functions)
+    :type: str
+    :param: sampling_interval: interval of samples in seconds
+    :type: float
+    """
+    def __init__(self, mode = "events", sampling_interval = SAMPLING_INTERVAL):
+        if mode not in MODES:
+            raise Exception("Unknown profiler mode '{0}'".format(mode))
+        if mode == "sampling" and not hasattr(signal, "setitimer"):
+            raise Exception("Sampling profiler is not supported on this platform")
+        self.mode = mode
+        self.sampling_interval = sampling_interval
+        self.ctx = None
+        self.reset()
+
+    def reset(self):
+        self.events = {} # key -> type of event, value -> count
+        self.times = dict((p, 0.0) for p in PHASES)
+        self.calls = dict((p, 0) for p in PHASES)
+        self.nested_times = []
+        self.wall_time = 0
+        self.sim_time = 0
+        self.start_time = None
+        self.profile = None
+        self.samples = {} # key -> function, value -> [self, total]
+        self.samples_count = 0
+        self.signal_handler = None
+
+    def attach(self, ctx):
+        """
+        Instrument environment, processes, monitors and graph stats
+        of simulation. It is called by simulation after processes
+        are created.
+
+        :param: ctx: context of simulation
+        :type: ProcessContext
+        """
+        self.reset()
+        self.ctx = ctx
+        env = ctx.env
+        step = env.step
+        if self.mode == "events":
+            step = self._timed("step", step)
+        events = self.events
+
+        def counted_step():
+            queue = env._queue
+            if queue:
+                record = queue[0]
+                # records of calls of kernel (see Environment.call_later)
+                if record[-2] is None:
+                    name = "Call"
+                else:
+                    name = type(record[-1]).__name__
+                events[name] = events.get(name, 0) + 1
+            step()
+
+        env.step = counted_step
+        if self.mode != "events":
+            return
+        env.schedule = self._timed("schedule", env.schedule)
+        env.call_later = self._timed("schedule", env.call_later)
+
+        for p in ctx.processes:
+            sources = [p, p.communicator, p.clock, getattr(p, "storage", None)]
+            for source in sources:
+                if source is not None:
+                    source.wrap_callbacks(lambda cb: self._timed("fire", cb))
+
+        mm = ctx.monitor_manager
+        monitors = mm.global_monitors.values()
+        for pr_monitors in mm.monitors.values():
+            monitors.extend(pr_monitors)
+        for m in monitors:
+            m.put = self._timed("monitor", m.put)
+
+        graph_stats = getattr(ctx, "graph_stats", None)
+        if graph_stats:
+            for name in GRAPH_STATS_METHODS:
+                setattr(graph_stats, name,
+                        self._timed("graph_stats", getattr(graph_stats, name)))
+
+    def _timed(self, phase, function):
+        times = self.times
+        calls = self.calls
+        nested_times = self.nested_times
+        timer = timeit.default_timer
+
+        def timed(*args, **kwargs):
+            nested_times.append(0.0)
+            start = timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = timer() - start
+                times[phase] += elapsed - nested_times.pop()
+                calls[phase] += 1
+                if nested_times:
+                    nested_times[-1] += elapsed
+        return timed
+
+    def start(self):
+        """
+        Start measuring of run.
+        """
+        if self.mode == "cprofile":
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif self.mode == "sampling":
+            self._start_sampling()
+        self.start_time = timeit.default_timer()
+
+    def stop(self):
+        """
+        Stop measuring of run.
+        """
+        self.wall_time = timeit.default_timer() - self.start_time
+        if self.mode == "cprofile":
+            self.profile.disable()
+        elif self.mode == "sampling":
+            self._stop_sampling()
+        self.sim_time = self.ctx.env.now
+
+    def _start_sampling(self):
+        samples = self.samples
+
+        def on_sample(signum, frame):
+            self.samples_count += 1
+            seen = set()
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                counts = samples.get(key)
+                if counts is None:
+                    counts = samples[key] = [0, 0]
+                if leaf:
+                    counts[0] += 1
+                    leaf = False
+                # recursive functions are counted once per sample
+                if key not in seen:
+                    counts[1] += 1
+                    seen.add(key)
+                frame = frame.f_back
+
+        self.signal_handler = signal.signal(signal.SIGPROF, on_sample)
+        signal.setitimer(signal.ITIMER_PROF, self.sampling_interval,
+                         self.sampling_interval)
+
+    def _stop_sampling(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self.signal_handler or signal.SIG_DFL)
+
+    def get_functions(self, limit = REPORT_LIMIT):
+        """
+        Returns most expensive functions measured by cProfile (ordered
+        by total time) or by sampling profiler (ordered by own samples).
+
+        :return: list of dicts with keys 'function', 'calls' (cProfile),\
+        'self' and 'total' (seconds for cProfile, samples for sampling)
+        :rtype: list of dict
+        """
+        functions = []
+        if self.mode == "cprofile" and self.profile:
+            stats = pstats.Stats(self.profile).stats
+            for (filename, line, name), (_, calls, tt, ct, _) in stats.iteritems():
+                functions.append({"function": _function_name(filename, line, name),
+                                  "calls": calls,
+                                  "self": tt,
+                                  "total": ct})
+            functions.sort(key = lambda f: (-f["total"], -f["self"]))
+        elif self.mode == "sampling":
+            for (filename, line, name), (self_count, total) in self.samples.iteritems():
+                functions.append({"function": _function_name(filename, line, name),
+                                  "self": self_count,
+                                  "total": total})
+            functions.sort(key = lambda f: (-f["self"], -f["total"]))
+        return functions[:limit]
+
+    def get_report(self):
+        """
+        Returns measured values of run. Phases are measured only
+        in 'events' mode, time of run, which is not in any phase (loop
+        of environment), is stored as phase 'other'.
+
+        :return: report in JSON serializable form
+        :rtype: dict
+        """
+        events_count = sum(self.events.values())
+        report = {"mode": self.mode,
+                  "wall_time": self.wall_time,
+                  "sim_time": self.sim_time,
+                  "events_count": events_count,
+                  "events_per_sec": events_count / self.wall_time if self.wall_time > 0 else 0,
+                  "events": self.events}
+        if self.mode == "events":
+            phases = {}
+            for p in PHASES:
+                phases[p] = {"calls": self.calls[p], "time": self.times[p]}
+            phases["other"] = {"calls": 0,
+                               "time": max(0.0, self.wall_time - sum(self.times.values()))}
+            report["phases"] = phases
+        else:
+            report["functions"] = self.get_functions()
+        if self.mode == "sampling":
+            report["samples_count"] = self.samples_count
+            report["sampling_interval"] = self.sampling_interval
+        return report
+
+    def format_report(self):
+        """
+        Returns report of run as text.
+
+        :rtype: str
+        """
+        report = self.get_report()
+        wall_time = report["wall_time"] or 1
+        lines = ["Profile of simulation (mode '{0}')".format(self.mode),
+                 "Wall time: {0:.6f} s".format(report["wall_time"]),
+                 "Simulation time: {0}".format(report["sim_time"]),
+                 "Events: {0} ({1:.1f} events/s)".format(report["events_count"],
+                                                        report["events_per_sec"]),
+                 "",
+                 "Events by type:"]
+        events_count = report["events_count"] or 1
+        for name, count in sorted(report["events"].iteritems(),
+                                  key = lambda e: -e[1]):
+            lines.append("  {0:<20} {1:>10} {2:>6.1f} %".format(
+                name, count, count * 100.0 / events_count))
+
+        if self.mode == "events":
+            lines += ["", "Phases (time of nested phases excluded):",
+                      "  {0:<12} {1:>10} {2:>12} {3:>8}".format("phase", "calls",
+                                                                "time [s]", "wall")]
+            for p in PHASES + ["other"]:
+                phase = report["phases"][p]
+                lines.append("  {0:<12} {1:>10} {2:>12.6f} {3:>6.1f} %".format(
+                    p, phase["calls"], phase["time"], phase["time"] * 100.0 / wall_time))
+        elif self.mode == "cprofile":
+            lines += ["", "Functions (cProfile, by total time):",
+                      "  {0:>10} {1:>10} {2:>10}  function".format("calls", "self [s]",
+                                                                  "total [s]")]
+            for f in report["functions"]:
+                lines.append("  {0:>10} {1:>10.4f} {2:>10.4f}  {3}".format(
+                    f["calls"], f["self"], f["total"], f["function"]))
+        elif self.mode == "sampling":
+            samples_count = report["samples_count"] or 1
+            lines += ["", "Functions ({0} samples, interval {1} s, by own samples):".format(
+                          report["samples_count"], self.sampling_interval),
+                      "  {0:>8} {1:>8}  function".format("self", "total")]
+            for f in report["functions"]:
+                lines.append("  {0:>6.1f} % {1:>6.1f} %  {2}".format(
+                    f["self"] * 100.0 / samples_count,
+                    f["total"] * 100.0 / samples_count,
+                    f["function"]))
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, filename):
+        """
+        Write text report of run to file. In 'cprofile' mode also
+        statistics of cProfile are written to 'filename' with suffix
+        '.prof' (readable by pstats).
+
+        :param: filename: name of report file
+        :type: str
+        """
+        with open(filename, "w") as f:
+            f.write(self.format_report())
+        if self.mode == "cprofile" and self.profile:
+            self.profile.dump_stats(filename + ".prof")
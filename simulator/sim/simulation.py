@@ -1,7 +1,9 @@
 import simpy
+import environment
 from simulator.gui import events
 from processes.process import ProcessContext
 from processes.monitor import MonitorManager
+from processes.trace import TraceFile
 from simulator.gui.graphstats import GraphStats, VisualGraphStats
 from processes.monitor import GlobalTimeMonitor, GlobalMemoryMonitor
 from processes.process import StorageProcess
@@ -10,7 +12,9 @@ from processfactory import process_factory as pf
 
 
 class AbstractSimulation(events.EventSource):
-    def __init__(self, process_type, process_count, arguments = None):
+    def __init__(self, process_type, process_count, arguments = None,
+                 environment_name = None, monitor_profile = None,
+                 trace_filename = None):
         events.EventSource.__init__(self)
         self.register_event("start")
         self.register_event("end")
@@ -20,9 +24,12 @@ class AbstractSimulation(events.EventSource):
         self.process_type = process_type
         self.process_count = process_count
         self.arguments = arguments
+        self.environment_name = environment_name
+        self.trace_filename = trace_filename
         self.processes_events = []
-        self.ctx = ProcessContext(simpy.Environment(),
-                                  MonitorManager(),
+        self.profiler = None
+        self.ctx = ProcessContext(self.create_environment(),
+                                  MonitorManager(monitor_profile),
                                   arguments)
 
         self.ctx.monitor_manager.add_callback("start", self)
@@ -42,8 +49,37 @@ class AbstractSimulation(events.EventSource):
     def get_arguments(self):
         return self.arguments
 
+    def get_monitor_profile(self):
+        return self.ctx.monitor_manager.get_profile()
+
+    def get_environment_name(self):
+        return self.environment_name or environment.DEFAULT_ENVIRONMENT
+
+    def create_environment(self):
+        return environment.create_environment(self.environment_name)
+
+    def get_trace_filename(self):
+        return self.trace_filename
+
+    def set_profiler(self, profiler):
+        """
+        Set profiler of runs started by 'start'. Profiler instruments
+        only this simulation (see SimulationProfiler).
+
+        :param: profiler: profiler or None for run without profiling
+        :type: SimulationProfiler | None
+        """
+        self.profiler = profiler
+
+    def get_profiler(self):
+        return self.profiler
+
     def _create_procesess(self):
-        self.ctx.monitor_manager.clear_monitors()
+        mm = self.ctx.monitor_manager
+        mm.clear_monitors()
+        if self.trace_filename:
+            mm.close_trace()
+            mm.set_trace(TraceFile(self.trace_filename))
         processes = self.create_processes()
         for p in processes:
             p.init_monitor_callbacks()
@@ -52,6 +88,8 @@ class AbstractSimulation(events.EventSource):
 
     def start(self):
         self._create_procesess()
+        if self.profiler:
+            self.profiler.attach(self.ctx)
         self.running = True
         self._prepare()
         self.fire("start", self)
@@ -66,14 +104,30 @@ class AbstractSimulation(events.EventSource):
                 except Exception:
                     pass
             self.processes_events = []
+            self._close_processes()
             self.ctx.processes = []
             self.ctx.env._now = 0
 
     def _run(self):
-        success = self.run()
-        self.running = False
-        if success:
-            self.fire("end", self)
+        try:
+            if self.profiler:
+                self.profiler.start()
+                try:
+                    success = self.run()
+                finally:
+                    self.profiler.stop()
+            else:
+                success = self.run()
+            self.running = False
+            self.ctx.monitor_manager.flush()
+            if success:
+                self.fire("end", self)
+        finally:
+            self._close_processes()
+
+    def _close_processes(self):
+        for p in self.ctx.processes:
+            p.close()
 
     def _prepare(self):
         self.ctx.env._now = 0
@@ -108,29 +162,43 @@ class AbstractSimulation(events.EventSource):
 
 class Simulation(AbstractSimulation):
     def __init__(self, process_type, process_count, graph,
-                 network_model,process_model, arguments = None):
-        AbstractSimulation.__init__(self, process_type, process_count, arguments)
+                 network_model,process_model, arguments = None,
+                 environment_name = None, monitor_profile = None,
+                 trace_filename = None, message_batching = None,
+                 message_pool = None):
+        AbstractSimulation.__init__(self, process_type, process_count,
+                                    arguments, environment_name,
+                                    monitor_profile, trace_filename)
         self.ctx.graph = graph
         self.ctx.graph_stats = GraphStats(graph)
         self.ctx.network_model = network_model
         self.ctx.process_model = process_model
+        self.ctx.message_batching = message_batching
+        self.ctx.message_pool = message_pool
+
+    def get_message_batching(self):
+        return self.ctx.message_batching
 
     def prepare(self):
         self.ctx.graph_stats.reset()
 
     def create_processes(self):
         procesess = []
-        global_time_monitor = GlobalTimeMonitor()
         mm = self.ctx.monitor_manager
-        mm.register_monitor(global_time_monitor)
+        global_time_monitor = None
+        if mm.is_enabled("GlobalTimeMonitor"):
+            global_time_monitor = GlobalTimeMonitor()
+            mm.register_monitor(global_time_monitor)
 
         for i in xrange(self.get_process_count()):
             procesess.append(pf.create_process(i, self.ctx, self.process_type))
 
-        global_memory_monitor = GlobalMemoryMonitor(global_time_monitor, procesess)
-        mm.register_monitor(global_memory_monitor)
+        if mm.is_enabled("GlobalMemoryMonitor"):
+            global_memory_monitor = GlobalMemoryMonitor(global_time_monitor, procesess)
+            mm.register_monitor(global_memory_monitor)
         pr = procesess[0]
-        if issubclass(pr.__class__, StorageProcess):
+        if (issubclass(pr.__class__, StorageProcess) and
+                mm.is_enabled("GlobalStorageMonitor")):
             global_storage_monitor = GlobalStorageMonitor(procesess)
             mm.register_monitor(global_storage_monitor)
         return procesess
@@ -138,9 +206,11 @@ class Simulation(AbstractSimulation):
 
 class VisualSimulation(Simulation):
     def __init__(self, process_type, process_count, graph,
-                 network_model, process_model, arguments = None):
+                 network_model, process_model, arguments = None,
+                 environment_name = None, monitor_profile = None):
         Simulation.__init__(self, process_type, process_count, graph,
-                            network_model, process_model, arguments)
+                            network_model, process_model, arguments,
+                            environment_name, monitor_profile)
         self.register_event("step")
         self.register_event("visible_step")
         self.generator = None
@@ -158,15 +228,17 @@ class VisualSimulation(Simulation):
                 yield step
         except simpy.core.StopSimulation:
             self.running = False
-            self.ctx.env = simpy.Environment()
+            self.ctx.env = self.create_environment()
             self.fire("stop", self)
         except simpy.core.EmptySchedule:
             self.running = False
             self.fire("end", self)
         except Exception as ex:
             self.running = False
-            self.ctx.env = simpy.Environment()
+            self.ctx.env = self.create_environment()
             self.fire("interrupt", ex.message)
+        finally:
+            self._close_processes()
 
     def prepare(self):
         self.discovered_nodes = 0
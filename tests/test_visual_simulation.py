@@ -0,0 +1,130 @@
+"""
+Headless smoke run of VisualSimulation. Visible graph is loaded from SVG
+written in same form as graphviz output, so graphviz is not needed.
+
+Run:
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from simulator.gui.graphloader import GraphLoader, SVGVisibleGraphLoader
+from simulator.sim import environment
+from simulator.sim import simulation
+from simulator.sim import processfactory as pf
+
+
+GRAPH_XML = """<?xml version="1.0" ?>
+<statespace init-node-id="init">
+  <node id="init" size="1">
+    <arc events-count="10" label="a" node-id="1" pids="" time="0.5"/>
+    <arc events-count="20" label="b" node-id="2" pids="" time="0.25"/>
+  </node>
+  <node id="1" size="2">
+    <arc events-count="30" label="c" node-id="3" pids="" time="0.75"/>
+    <arc events-count="40" label="d" node-id="2" pids="" time="0.5"/>
+  </node>
+  <node id="2" size="3">
+    <arc events-count="50" label="e" node-id="3" pids="" time="0.25"/>
+  </node>
+  <node id="3" size="4">
+    <arc events-count="60" label="f" node-id="init" pids="" time="1.0"/>
+  </node>
+</statespace>
+"""
+
+SVG_NODE = """<g class="node"><title>{id}</title>
+<polygon fill="none" stroke="black" points="{x2},{y1} {x1},{y1} {x1},{y2} {x2},{y2} {x2},{y1}"/>
+<text x="{x1}" y="{y1}" font-size="14.00">{id}</text>
+</g>
+"""
+
+SVG_EDGE = """<g class="edge"><title>{source}&#45;&gt;{target}</title>
+<path fill="none" stroke="black" d="M{x1},{y1}C{x1},{y2} {x2},{y1} {x2},{y2}"/>
+<polygon fill="black" stroke="black" points="{x2},{y2} {x1},{y2} {x2},{y1} {x2},{y2}"/>
+<text x="{x1}" y="{y2}" font-size="14.00">{label}</text>
+</g>
+"""
+
+
+def create_svg(graph):
+    node_ids = sorted(graph.nodes.keys())
+    positions = {}
+    items = []
+    for i, node_id in enumerate(node_ids):
+        x, y = 10 + 60 * i, -10 - 60 * i
+        positions[node_id] = (x, y)
+        items.append(SVG_NODE.format(id = node_id, x1 = x, y1 = y,
+                                     x2 = x + 40, y2 = y - 20))
+    for node_id in node_ids:
+        for edge in graph.get_node(node_id).get_edges():
+            x1, y1 = positions[node_id]
+            x2, y2 = positions[edge.target.id]
+            items.append(SVG_EDGE.format(source = node_id,
+                                         target = edge.target.id,
+                                         label = edge.label,
+                                         x1 = x1, y1 = y1, x2 = x2, y2 = y2))
+    return ("<svg width=\"300pt\" height=\"300pt\" viewBox=\"0.00 0.00 300.00 300.00\""
+            " xmlns=\"http://www.w3.org/2000/svg\">\n"
+            "<g id=\"graph0\" class=\"graph\" transform=\"scale(1 1) rotate(0) translate(4 296)\">\n"
+            "<polygon fill=\"white\" stroke=\"none\" points=\"-4,4 -4,-296 296,-296 296,4 -4,4\"/>\n"
+            "{0}</g>\n</svg>\n").format("".join(items))
+
+
+class VisualSimulationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        graph_file = os.path.join(self.tmp_dir, "graph.xml")
+        with open(graph_file, "w") as f:
+            f.write(GRAPH_XML)
+        self.graph = GraphLoader(graph_file).load()
+        svg_file = os.path.join(self.tmp_dir, "graph.svg")
+        with open(svg_file, "w") as f:
+            f.write(create_svg(self.graph))
+        self.visible_graph = SVGVisibleGraphLoader(self.graph, svg_file).load()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_edge_ids_count(self):
+        self.assertEqual(self.visible_graph.get_edge_ids_count(),
+                         self.graph.get_edge_ids_count())
+
+    def run_simulation(self, simulation_class, graph, process_type,
+                       environment_name):
+        factory = pf.process_factory
+        network_model = factory.get_network_model(factory.get_network_models()[0])
+        process_model = factory.get_process_model(factory.get_process_models()[0])
+        arguments = factory.get_process_params_dict(process_type)
+        sim = simulation_class(process_type, 2, graph, network_model,
+                               process_model, arguments, environment_name)
+        results = []
+        sim.connect("end", lambda s: results.append("end"))
+        sim.connect("interrupt", results.append)
+        sim.start()
+        while sim.is_running():
+            sim.do_visible_step()
+        return sim, results
+
+    def test_run(self):
+        # visual simulation has to end same as simulation of model graph,
+        # some algorithms fail on their own assertions
+        for process_type in pf.process_factory.get_processes_names():
+            for environment_name in environment.get_environments():
+                _, expected = self.run_simulation(simulation.Simulation,
+                                                  self.graph, process_type,
+                                                  environment_name)
+                sim, results = self.run_simulation(simulation.VisualSimulation,
+                                                   self.visible_graph,
+                                                   process_type,
+                                                   environment_name)
+                self.assertEqual(results, expected,
+                                 "{0} ({1})".format(process_type, environment_name))
+                if results == ["end"]:
+                    self.assertEqual(sim.ctx.graph_stats.get_discovered_nodes_count(),
+                                     self.graph.get_nodes_count())
+
+
+if __name__ == "__main__":
+    unittest.main()